@@ -8,6 +8,10 @@ def _ff():
     local = os.path.join(os.getcwd(), 'ffmpeg.exe')
     return local if os.path.exists(local) else 'ffmpeg'
 
+def _ffprobe():
+    local = os.path.join(os.getcwd(), 'ffprobe.exe')
+    return local if os.path.exists(local) else 'ffprobe'
+
 def _open_folder(path):
     import platform
     if platform.system() == "Windows":
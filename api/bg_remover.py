@@ -10,8 +10,12 @@ import logging
 from typing import Tuple, List, Optional, Dict, Any
 from dataclasses import dataclass
 import base64
+import threading
+import time
+import zlib
 from io import BytesIO
-from collections import deque
+from collections import deque, OrderedDict
+from .jobs import JobCancelled
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,9 +26,33 @@ logger = logging.getLogger(__name__)
 
 @dataclass
 class SessionState:
-    mask_base64: str
+    # One edit as the XOR of the mask before and after it, cropped to the
+    # changed rectangle and zlib-compressed. XOR-ing it into the mask again
+    # undoes the edit, and XOR-ing it once more redoes it.
+    rect: Tuple[int, int, int, int]
+    delta: bytes
     timestamp: datetime
     action: str
+    
+    @classmethod
+    def from_masks(cls, before: np.ndarray, after: np.ndarray, action: str) -> Optional['SessionState']:
+        changed = cv2.findNonZero(cv2.compare(before, after, cv2.CMP_NE))
+        if changed is None:
+            return None
+        x, y, w, h = cv2.boundingRect(changed)
+        patch = cv2.bitwise_xor(before[y:y + h, x:x + w], after[y:y + h, x:x + w])
+        return cls((x, y, w, h), zlib.compress(patch.tobytes(), 1), datetime.now(), action)
+    
+    def apply(self, mask: np.ndarray) -> np.ndarray:
+        x, y, w, h = self.rect
+        patch = np.frombuffer(zlib.decompress(self.delta), np.uint8).reshape(h, w)
+        out = mask.copy()
+        out[y:y + h, x:x + w] ^= patch
+        return out
+    
+    @property
+    def nbytes(self) -> int:
+        return len(self.delta)
 
 
 class SecurityValidator:
@@ -88,23 +116,32 @@ class CoordinateScaler:
 
 
 class SessionHistory:
-    def __init__(self, max_size: int = 20):
-        self.undo_stack: deque = deque(maxlen=max_size)
-        self.redo_stack: deque = deque(maxlen=max_size)
+    def __init__(self, max_size: int = 500, max_bytes: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.undo_stack: deque = deque()
+        self.redo_stack: deque = deque()
+        self._bytes = 0
     
     def commit(self, state: SessionState):
-        self.undo_stack.append(state)
+        self._bytes -= sum(s.nbytes for s in self.redo_stack)
         self.redo_stack.clear()
+        self.undo_stack.append(state)
+        self._bytes += state.nbytes
+        while self.undo_stack and (len(self.undo_stack) > self.max_size or self._bytes > self.max_bytes):
+            self._bytes -= self.undo_stack.popleft().nbytes
     
     def undo(self) -> Optional[SessionState]:
-        if len(self.undo_stack) < 2:
+        """The edit to revert; apply it to the current mask."""
+        if not self.undo_stack:
             return None
         
-        current = self.undo_stack.pop()
-        self.redo_stack.append(current)
-        return self.undo_stack[-1]
+        state = self.undo_stack.pop()
+        self.redo_stack.append(state)
+        return state
     
     def redo(self) -> Optional[SessionState]:
+        """The edit to re-apply; apply it to the current mask."""
         if not self.redo_stack:
             return None
         
@@ -112,8 +149,12 @@ class SessionHistory:
         self.undo_stack.append(state)
         return state
     
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+    
     def can_undo(self) -> bool:
-        return len(self.undo_stack) > 1
+        return len(self.undo_stack) > 0
     
     def can_redo(self) -> bool:
         return len(self.redo_stack) > 0
@@ -121,6 +162,7 @@ class SessionHistory:
     def clear(self):
         self.undo_stack.clear()
         self.redo_stack.clear()
+        self._bytes = 0
 
 
 class ResourceManager:
@@ -196,6 +238,61 @@ class ResourceManager:
         return False
 
 
+class SnapshotWriter:
+    """Writes session images to disk on a background thread, for crash
+    recovery only. Only the newest array per path is kept, so a burst of
+    strokes costs a single PNG encode."""
+
+    def __init__(self):
+        self._pending: Dict[str, np.ndarray] = {}
+        self._cond = threading.Condition()
+        self._io = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, path: str, image: np.ndarray):
+        with self._cond:
+            self._pending[path] = image
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='bg-snapshots', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, *paths: str):
+        with self._cond:
+            items = [(p, self._pending.pop(p)) for p in paths if p in self._pending]
+        # Holding the I/O lock also waits out a write already in flight.
+        with self._io:
+            for path, image in items:
+                self._write(path, image)
+
+    def discard(self, prefix: str):
+        with self._cond:
+            for path in [p for p in self._pending if os.path.basename(p).startswith(prefix)]:
+                del self._pending[path]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                path, image = self._pending.popitem()
+                self._io.acquire()
+            try:
+                self._write(path, image)
+            finally:
+                self._io.release()
+
+    @staticmethod
+    def _write(path: str, image: np.ndarray):
+        root, ext = os.path.splitext(path)
+        tmp = f"{root}.tmp{ext}"
+        try:
+            cv2.imwrite(tmp, image)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.error(f"Snapshot write failed for {path}: {e}")
+
+
 class ImageProcessor:
     @staticmethod
     def mask_to_base64(mask: np.ndarray) -> str:
@@ -268,6 +365,21 @@ class ImageProcessor:
         result = (image * mask_expanded + new_bg * (1.0 - mask_expanded)).astype(np.uint8)
         return result
     
+    @staticmethod
+    def preview_tile(image: np.ndarray, mask: np.ndarray, rect: Tuple[int, int, int, int]) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+        """Overlay for the area around ``rect`` only. The rect grows by the
+        contour width, and the overlay is rendered with extra margin so that
+        contours at the crop edge never show up in the returned tile."""
+        H, W = mask.shape[:2]
+        x, y, w, h = rect
+        x0, y0, x1, y1 = max(0, x - 3), max(0, y - 3), min(W, x + w + 3), min(H, y + h + 3)
+        px0, py0, px1, py1 = max(0, x0 - 4), max(0, y0 - 4), min(W, x1 + 4), min(H, y1 + 4)
+        overlay = ImageProcessor.generate_preview_overlay(
+            image[py0:py1, px0:px1], np.ascontiguousarray(mask[py0:py1, px0:px1])
+        )
+        tile = overlay[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        return tile, (x0, y0, x1 - x0, y1 - y0)
+    
     @staticmethod
     def apply_strokes_to_mask(
         mask: np.ndarray,
@@ -276,7 +388,23 @@ class ImageProcessor:
         display_size: Optional[Tuple[int, int]] = None,
         original_size: Optional[Tuple[int, int]] = None
     ) -> np.ndarray:
+        return ImageProcessor.apply_strokes_with_rect(
+            mask, strokes, coordinate_scaler, display_size, original_size
+        )[0]
+    
+    @staticmethod
+    def apply_strokes_with_rect(
+        mask: np.ndarray,
+        strokes: List[Dict],
+        coordinate_scaler: Optional[CoordinateScaler] = None,
+        display_size: Optional[Tuple[int, int]] = None,
+        original_size: Optional[Tuple[int, int]] = None
+    ) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]]]:
+        """Apply strokes and return the new mask with the (x, y, w, h) area
+        they touched; only that area is smoothed."""
         mask_copy = mask.copy()
+        H, W = mask.shape[:2]
+        x0, y0, x1, y1 = W, H, 0, 0
         
         for stroke in strokes:
             points = stroke['points']
@@ -297,6 +425,10 @@ class ImageProcessor:
             
             if len(points_np) == 0:
                 continue
+            
+            pad = radius + 2
+            x0, y0 = min(x0, int(points_np[:, 0].min()) - pad), min(y0, int(points_np[:, 1].min()) - pad)
+            x1, y1 = max(x1, int(points_np[:, 0].max()) + pad + 1), max(y1, int(points_np[:, 1].max()) + pad + 1)
                 
             if len(points_np) == 1:
                 cv2.circle(mask_copy, tuple(points_np[0]), radius, color, -1, cv2.LINE_AA)
@@ -314,75 +446,257 @@ class ImageProcessor:
                             cv2.LINE_AA
                         )
         
-        if mask_copy.max() > 0:  
-            mask_copy = cv2.GaussianBlur(mask_copy, (3, 3), 0)
+        x0, y0, x1, y1 = max(0, x0), max(0, y0), min(W, x1), min(H, y1)
+        if x1 <= x0 or y1 <= y0:
+            return mask_copy, None
         
-        return mask_copy
+        region = mask_copy[y0:y1, x0:x1]
+        if region.max() > 0:
+            mask_copy[y0:y1, x0:x1] = cv2.GaussianBlur(region, (3, 3), 0)
+        
+        return mask_copy, (x0, y0, x1 - x0, y1 - y0)
+
+
+class ModelPool:
+    """Loaded rembg sessions, least recently used first out once their
+    estimated size (the ONNX file on disk) goes over max_bytes. The most
+    recently used model is always kept, even if it alone is over budget."""
+    DEFAULT_MODEL_BYTES = 180 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._sessions: 'OrderedDict[str, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _model_bytes(model_name: str) -> int:
+        home = os.getenv('U2NET_HOME', os.path.join(os.path.expanduser('~'), '.u2net'))
+        try:
+            return os.path.getsize(os.path.join(home, model_name + '.onnx'))
+        except OSError:
+            return ModelPool.DEFAULT_MODEL_BYTES
+
+    def _stat(self, model_name: str) -> Dict[str, float]:
+        return self.stats.setdefault(model_name, {'loads': 0, 'load_seconds': 0.0, 'hits': 0,
+                                                  'inferences': 0, 'inference_seconds': 0.0})
+
+    def _lookup(self, model_name: str):
+        with self._lock:
+            entry = self._sessions.get(model_name)
+            if entry is None: return None
+            self._sessions.move_to_end(model_name)
+            self._stat(model_name)['hits'] += 1
+            return entry[0]
+
+    def get(self, model_name: str) -> Tuple[Any, float]:
+        """Returns (session, seconds spent loading it for this call)."""
+        session = self._lookup(model_name)
+        if session is not None:
+            return session, 0.0
+        # One load at a time, so a warm-up and a request for the same model share it.
+        with self._load_lock:
+            session = self._lookup(model_name)
+            if session is not None:
+                return session, 0.0
+            t0 = time.perf_counter()
+            session = new_session(model_name)
+            elapsed = time.perf_counter() - t0
+            size = self._model_bytes(model_name)
+            with self._lock:
+                self._sessions[model_name] = (session, size)
+                stat = self._stat(model_name)
+                stat['loads'] += 1
+                stat['load_seconds'] += elapsed
+                self._evict()
+            logger.info(f"Loaded model {model_name} in {elapsed:.2f}s")
+            return session, elapsed
+
+    def _evict(self):
+        total = sum(size for _, size in self._sessions.values())
+        while total > self.max_bytes and len(self._sessions) > 1:
+            name, (_, size) = self._sessions.popitem(last=False)
+            total -= size
+            logger.info(f"Unloaded model {name}")
+
+    def record_inference(self, model_name: str, seconds: float):
+        with self._lock:
+            stat = self._stat(model_name)
+            stat['inferences'] += 1
+            stat['inference_seconds'] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'loaded': list(self._sessions),
+                'loaded_bytes': sum(size for _, size in self._sessions.values()),
+                'max_bytes': self.max_bytes,
+                'models': {name: dict(stat) for name, stat in self.stats.items()}
+            }
 
 
 class BackgroundRemovalSystem:
-    def __init__(self, temp_dir: str = "editor_temp", model_name: str = "u2net"):
+    # Sessions whose decoded original and mask stay in memory; older ones are
+    # reloaded from their disk snapshot when touched again.
+    MAX_LIVE_SESSIONS = 3
+    # Overlays are drawn from copies downscaled by a power of two, as small as
+    # the editor canvas allows (or with the long side under PREVIEW_MAX_SIDE
+    # when the canvas size is unknown). Strokes and exports stay full size.
+    PREVIEW_MAX_SIDE = 1600
+
+    def __init__(self, temp_dir: str = "editor_temp", model_name: str = "u2net", models: Optional[ModelPool] = None):
         self.temp_dir = temp_dir
         self.resource_manager = ResourceManager(temp_dir)
         self.coordinate_scaler = CoordinateScaler()
         self.session_histories: Dict[str, SessionHistory] = {}
         self.session_metadata: Dict[str, Dict] = {}
         self.model_name = model_name
-        
-        try:
-            self.rembg_session = new_session(model_name)
-            logger.info(f"Initialized with model: {model_name}")
-        except Exception as e:
-            logger.error(f"Failed to initialize rembg: {e}")
-            raise
+        self.models = models or ModelPool()
+        self.snapshots = SnapshotWriter()
+        self._live: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._live_lock = threading.RLock()
     
     def _get_or_create_history(self, session_id: str) -> SessionHistory:
         if session_id not in self.session_histories:
             self.session_histories[session_id] = SessionHistory()
         return self.session_histories[session_id]
     
+    def _remember(self, session_id: str, image: np.ndarray, mask: np.ndarray) -> Dict[str, Any]:
+        with self._live_lock:
+            live = {'image': image, 'mask': mask}
+            self._live[session_id] = live
+            self._live.move_to_end(session_id)
+            while len(self._live) > self.MAX_LIVE_SESSIONS:
+                self._live.popitem(last=False)
+            return live
+    
+    def _session_arrays(self, session_id: str) -> Dict[str, Any]:
+        """Decoded original (BGR) and mask for a session, from memory when
+        possible, otherwise from the last disk snapshot."""
+        with self._live_lock:
+            live = self._live.get(session_id)
+            if live is not None:
+                self._live.move_to_end(session_id)
+                return live
+            
+            original_path = self.resource_manager.get_session_path(session_id, "original.jpg")
+            mask_path = self.resource_manager.get_session_path(session_id, "mask.png")
+            self.snapshots.flush(original_path, mask_path)
+            img = cv2.imread(original_path)
+            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+            if img is None or mask is None:
+                raise FileNotFoundError(f"Files not found for session: {session_id}")
+            return self._remember(session_id, img, mask)
+    
+    def _set_mask(self, session_id: str, mask: np.ndarray, rect: Optional[Tuple[int, int, int, int]] = None):
+        with self._live_lock:
+            live = self._session_arrays(session_id)
+            live['mask'] = mask
+            if 'preview_mask' in live:
+                f = live['factor']
+                if f == 1:
+                    live['preview_mask'] = mask
+                elif rect is None:
+                    live['preview_mask'] = self._downscale(mask, f)
+                else:
+                    (x0, y0, x1, y1), (px, py, pw, ph) = self._scale_rect(rect, f, mask.shape)
+                    small = self._downscale(mask[y0:y1, x0:x1], f)
+                    live['preview_mask'][py:py + ph, px:px + pw] = small.reshape(ph, pw)
+        self.snapshots.submit(self.resource_manager.get_session_path(session_id, "mask.png"), mask)
+    
+    @staticmethod
+    def _downscale(image: np.ndarray, f: int) -> np.ndarray:
+        """Exact 1/f block average. Edges are padded by replication up to a
+        multiple of f, so a grid-aligned crop (see _scale_rect) downscales to
+        the same pixels as the matching part of the whole image."""
+        if f == 1:
+            return image
+        h, w = image.shape[:2]
+        pad_h, pad_w = -h % f, -w % f
+        if pad_h or pad_w:
+            image = cv2.copyMakeBorder(image, 0, pad_h, 0, pad_w, cv2.BORDER_REPLICATE)
+        return cv2.resize(image, ((w + pad_w) // f, (h + pad_h) // f), interpolation=cv2.INTER_AREA)
+    
+    @staticmethod
+    def _scale_rect(rect: Tuple[int, int, int, int], f: int, shape) -> Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]:
+        """Grow a full-size rect to the f-pixel grid. Returns it as (x0, y0, x1, y1)
+        together with the matching preview rect (x, y, w, h)."""
+        H, W = shape[:2]
+        x, y, w, h = rect
+        x0, y0 = (x // f) * f, (y // f) * f
+        x1, y1 = min(W, -(-(x + w) // f) * f), min(H, -(-(y + h) // f) * f)
+        return (x0, y0, x1, y1), (x0 // f, y0 // f, -(-(x1 - x0) // f), -(-(y1 - y0) // f))
+    
+    def _preview_factor(self, image: np.ndarray, display_size: Optional[Tuple[int, int]]) -> int:
+        H, W = image.shape[:2]
+        f = 1
+        if display_size:
+            dw, dh = display_size
+            while W // (f * 2) >= dw and H // (f * 2) >= dh:
+                f *= 2
+        else:
+            while max(W, H) / f > self.PREVIEW_MAX_SIDE:
+                f *= 2
+        return f
+    
+    def _preview(self, session_id: str, display_size: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """Session arrays with 'preview_image'/'preview_mask' at the current
+        factor. Without a display size the previous factor is kept. 'preview_fresh'
+        is set when the copies were just (re)built."""
+        with self._live_lock:
+            live = self._session_arrays(session_id)
+            if display_size or 'factor' not in live:
+                f = self._preview_factor(live['image'], display_size)
+            else:
+                f = live['factor']
+            if live.get('factor') != f or 'preview_mask' not in live:
+                live['factor'] = f
+                live['preview_image'] = self._downscale(live['image'], f)
+                live['preview_mask'] = self._downscale(live['mask'], f)
+                live['preview_fresh'] = True
+            return live
+    
     def generate_initial_mask(
         self,
         image_path: str,
         session_id: str,
-        return_format: str = 'base64'
+        return_format: str = 'base64',
+        model_name: Optional[str] = None
     ) -> Dict[str, Any]:
         try:
             session_id = SecurityValidator.validate_session_id(session_id)
             SecurityValidator.validate_file_size(image_path)
+            model_name = model_name or self.model_name
             
             original_path = self.resource_manager.get_session_path(session_id, "original.jpg")
             img = Image.open(image_path).convert('RGB')
-            img.save(original_path)
+            img_bgr = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
             
             self.session_metadata[session_id] = {
                 'original_size': img.size,
                 'created_at': datetime.now().isoformat()
             }
             
-            logger.info(f"Generating mask for session: {session_id}")
-            output = remove(img, session=self.rembg_session, only_mask=True)
+            logger.info(f"Generating mask for session: {session_id} ({model_name})")
+            rembg_session, load_seconds = self.models.get(model_name)
+            t0 = time.perf_counter()
+            output = remove(img, session=rembg_session, only_mask=True)
+            inference_seconds = time.perf_counter() - t0
+            self.models.record_inference(model_name, inference_seconds)
             
             mask_np = np.array(output)
             if len(mask_np.shape) == 3:
                 mask_np = cv2.cvtColor(mask_np, cv2.COLOR_RGB2GRAY)
             
-            mask_path = self.resource_manager.get_session_path(session_id, "mask.png")
-            cv2.imwrite(mask_path, mask_np)
+            self._remember(session_id, img_bgr, mask_np)
+            self.snapshots.submit(original_path, img_bgr)
+            self.snapshots.submit(self.resource_manager.get_session_path(session_id, "mask.png"), mask_np)
             
             history = self._get_or_create_history(session_id)
-            state = SessionState(
-                mask_base64=ImageProcessor.mask_to_base64(mask_np),
-                timestamp=datetime.now(),
-                action='initial'
-            )
-            history.commit(state)
+            history.clear()
             
-            preview_url = self._generate_preview_response(
-                original_path,
-                mask_np,
-                return_format
-            )
+            preview_url = self._generate_preview_response(session_id, return_format)
             
             logger.info(f"Mask generation complete: {session_id}")
             
@@ -390,6 +704,9 @@ class BackgroundRemovalSystem:
                 'success': True,
                 'preview': preview_url,
                 'session_id': session_id,
+                'model': model_name,
+                'load_seconds': round(load_seconds, 3),
+                'inference_seconds': round(inference_seconds, 3),
                 'can_undo': history.can_undo(),
                 'can_redo': history.can_redo()
             }
@@ -403,42 +720,65 @@ class BackgroundRemovalSystem:
     
     def _generate_preview_response(
         self,
-        image_path: str,
-        mask: np.ndarray,
-        return_format: str
+        session_id: str,
+        return_format: str,
+        display_size: Optional[Tuple[int, int]] = None
     ) -> str:
-        img = cv2.imread(image_path)
-        if img is None:
-            raise FileNotFoundError(f"Image not found: {image_path}")
+        if return_format == 'file_path':
+            return self.resource_manager.get_session_path(session_id, "original.jpg")
         
+        with self._live_lock:
+            live = self._preview(session_id, display_size)
+            live.pop('preview_fresh', None)
+            img, mask = live['preview_image'], live['preview_mask']
         overlay = ImageProcessor.generate_preview_overlay(img, mask)
-        
-        if return_format == 'base64':
-            return ImageProcessor.image_to_base64(overlay)
-        elif return_format == 'file_path':
-            return image_path
-        else:
-            return ImageProcessor.image_to_base64(overlay)
+        return ImageProcessor.image_to_base64(overlay)
+    
+    # Above this share of the image a tile saves little; send the whole preview.
+    TILE_MAX_FRACTION = 0.5
+    
+    def _preview_fields(
+        self,
+        session_id: str,
+        return_format: str,
+        rect: Optional[Tuple[int, int, int, int]] = None,
+        tile: bool = False,
+        display_size: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """'preview' with the full overlay, or, when the client already shows
+        one at the current preview size and asks for tiles, just the changed
+        area as 'tile' + 'rect' (in preview pixels)."""
+        if tile and return_format == 'base64':
+            with self._live_lock:
+                live = self._preview(session_id, display_size)
+                fresh = live.get('preview_fresh', False)
+                img, mask, f = live['preview_image'], live['preview_mask'], live['factor']
+            if not fresh:
+                if rect is None:
+                    return {'tile': None, 'rect': None}
+                H, W = live['mask'].shape[:2]
+                if rect[2] * rect[3] <= W * H * self.TILE_MAX_FRACTION:
+                    _, prect = self._scale_rect(rect, f, (H, W))
+                    tile_img, tile_rect = ImageProcessor.preview_tile(img, mask, prect)
+                    return {'tile': ImageProcessor.image_to_base64(tile_img), 'rect': list(tile_rect)}
+        return {'preview': self._generate_preview_response(session_id, return_format, display_size)}
     
     def edit_mask(
         self,
         session_id: str,
         strokes: List[Dict],
         display_size: Optional[Tuple[int, int]] = None,
-        return_format: str = 'base64'
+        return_format: str = 'base64',
+        tile: bool = False
     ) -> Dict[str, Any]:
         try:
             session_id = SecurityValidator.validate_session_id(session_id)
             
-            mask_path = self.resource_manager.get_session_path(session_id, "mask.png")
-            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
-            
-            if mask is None:
-                raise FileNotFoundError(f"Mask not found for session: {session_id}")
+            live = self._session_arrays(session_id)
+            mask = live['mask']
+            original_size = (live['image'].shape[1], live['image'].shape[0])
             
-            original_size = self.session_metadata[session_id]['original_size']
-            
-            updated_mask = ImageProcessor.apply_strokes_to_mask(
+            updated_mask, rect = ImageProcessor.apply_strokes_with_rect(
                 mask,
                 strokes,
                 self.coordinate_scaler,
@@ -446,28 +786,20 @@ class BackgroundRemovalSystem:
                 original_size
             )
             
-            cv2.imwrite(mask_path, updated_mask)
+            self._set_mask(session_id, updated_mask, rect)
             
             history = self._get_or_create_history(session_id)
-            state = SessionState(
-                mask_base64=ImageProcessor.mask_to_base64(updated_mask),
-                timestamp=datetime.now(),
-                action=strokes[0]['mode'] if strokes else 'edit'
-            )
-            history.commit(state)
+            state = SessionState.from_masks(mask, updated_mask, strokes[0]['mode'] if strokes else 'edit')
+            if state is not None:
+                history.commit(state)
             
-            original_path = self.resource_manager.get_session_path(session_id, "original.jpg")
-            preview = self._generate_preview_response(
-                original_path,
-                updated_mask,
-                return_format
-            )
+            preview = self._preview_fields(session_id, return_format, rect, tile, display_size)
             
             logger.info(f"Mask edited: {session_id}, strokes: {len(strokes)}")
             
             return {
                 'success': True,
-                'preview': preview,
+                **preview,
                 'can_undo': history.can_undo(),
                 'can_redo': history.can_redo()
             }
@@ -479,7 +811,7 @@ class BackgroundRemovalSystem:
                 'error': str(e)
             }
     
-    def undo(self, session_id: str, return_format: str = 'base64') -> Dict[str, Any]:
+    def undo(self, session_id: str, return_format: str = 'base64', tile: bool = False) -> Dict[str, Any]:
         try:
             session_id = SecurityValidator.validate_session_id(session_id)
             history = self._get_or_create_history(session_id)
@@ -492,18 +824,15 @@ class BackgroundRemovalSystem:
                     'error': 'No history to undo'
                 }
             
-            mask = ImageProcessor.base64_to_mask(previous_state.mask_base64)
-            mask_path = self.resource_manager.get_session_path(session_id, "mask.png")
-            cv2.imwrite(mask_path, mask)
-            
-            original_path = self.resource_manager.get_session_path(session_id, "original.jpg")
-            preview = self._generate_preview_response(original_path, mask, return_format)
+            mask = previous_state.apply(self._session_arrays(session_id)['mask'])
+            self._set_mask(session_id, mask, previous_state.rect)
+            preview = self._preview_fields(session_id, return_format, previous_state.rect, tile)
             
             logger.info(f"Undo successful: {session_id}")
             
             return {
                 'success': True,
-                'preview': preview,
+                **preview,
                 'can_undo': history.can_undo(),
                 'can_redo': history.can_redo()
             }
@@ -515,7 +844,7 @@ class BackgroundRemovalSystem:
                 'error': str(e)
             }
     
-    def redo(self, session_id: str, return_format: str = 'base64') -> Dict[str, Any]:
+    def redo(self, session_id: str, return_format: str = 'base64', tile: bool = False) -> Dict[str, Any]:
         try:
             session_id = SecurityValidator.validate_session_id(session_id)
             history = self._get_or_create_history(session_id)
@@ -528,18 +857,15 @@ class BackgroundRemovalSystem:
                     'error': 'No history to redo'
                 }
             
-            mask = ImageProcessor.base64_to_mask(next_state.mask_base64)
-            mask_path = self.resource_manager.get_session_path(session_id, "mask.png")
-            cv2.imwrite(mask_path, mask)
-            
-            original_path = self.resource_manager.get_session_path(session_id, "original.jpg")
-            preview = self._generate_preview_response(original_path, mask, return_format)
+            mask = next_state.apply(self._session_arrays(session_id)['mask'])
+            self._set_mask(session_id, mask, next_state.rect)
+            preview = self._preview_fields(session_id, return_format, next_state.rect, tile)
             
             logger.info(f"Redo successful: {session_id}")
             
             return {
                 'success': True,
-                'preview': preview,
+                **preview,
                 'can_undo': history.can_undo(),
                 'can_redo': history.can_redo()
             }
@@ -563,14 +889,8 @@ class BackgroundRemovalSystem:
         try:
             session_id = SecurityValidator.validate_session_id(session_id)
             
-            original_path = self.resource_manager.get_session_path(session_id, "original.jpg")
-            mask_path = self.resource_manager.get_session_path(session_id, "mask.png")
-            
-            img = cv2.imread(original_path)
-            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
-            
-            if img is None or mask is None:
-                raise FileNotFoundError(f"Files not found for session: {session_id}")
+            live = self._session_arrays(session_id)
+            img, mask = live['image'], live['mask']
             
             if mode == 'remove_bg':
                 result = ImageProcessor.apply_mask_with_alpha(img, mask)
@@ -660,6 +980,10 @@ class BackgroundRemovalSystem:
         if session_id in self.session_metadata:
             del self.session_metadata[session_id]
         
+        with self._live_lock:
+            self._live.pop(session_id, None)
+        self.snapshots.discard(session_id)
+        
         return self.resource_manager.cleanup_session(session_id)
     
     def get_session_info(self, session_id: str) -> Dict[str, Any]:
@@ -680,17 +1004,43 @@ class BackgroundRemovalSystem:
             'can_undo': history.can_undo(),
             'can_redo': history.can_redo(),
             'history_size': len(history.undo_stack),
+            'history_bytes': history.nbytes,
             'metadata': metadata
         }
 
 
+DEFAULT_MODEL = 'isnet-general-use'
+# Budget for loaded ONNX models; BG_MODEL_POOL_MB overrides it.
+MODEL_POOL_BYTES = int(os.getenv('BG_MODEL_POOL_MB', '1024')) * 1024 * 1024
+
 _shared_system: Optional[BackgroundRemovalSystem] = None
+_system_lock = threading.Lock()
 
-def _get_system(model_name: str = "u2net") -> BackgroundRemovalSystem:
+def _get_system() -> BackgroundRemovalSystem:
+    # One system for every model: sessions and undo histories survive model
+    # switches, and each mask request picks its model from the pool.
     global _shared_system
-    if _shared_system is None or _shared_system.model_name != model_name:
-        _shared_system = BackgroundRemovalSystem(model_name=model_name, temp_dir="temp_bg_removed")
-    return _shared_system
+    with _system_lock:
+        if _shared_system is None:
+            _shared_system = BackgroundRemovalSystem(model_name=DEFAULT_MODEL, temp_dir="temp_bg_removed",
+                                                     models=ModelPool(MODEL_POOL_BYTES))
+        return _shared_system
+
+def warm_up(model_name=None):
+    """Load a model into the pool ahead of the first request."""
+    try:
+        model_name = model_name or DEFAULT_MODEL
+        _, seconds = _get_system().models.get(model_name)
+        return {'success': True, 'model': model_name, 'load_seconds': round(seconds, 3)}
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+def model_stats():
+    try:
+        return {'success': True, **_get_system().models.summary()}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
 
 def cleanup_temp():
     try:
@@ -700,16 +1050,23 @@ def cleanup_temp():
     except Exception as e:
         logger.error(f"Legacy cleanup failed: {e}")
 
-def remove_bg(src, model='isnet-general-use', mode='remove_bg', blur_radius=15, new_bg_path=None):
+def remove_bg(src, model=DEFAULT_MODEL, mode='remove_bg', blur_radius=15, new_bg_path=None, job=None):
     import uuid
     
-    sys = _get_system(model_name=model)
+    if job: job.check_cancelled()
+    sys = _get_system()
     session_id = f"legacy_{uuid.uuid4().hex}"[:20] 
     
     try:
-        init_res = sys.generate_initial_mask(src, session_id, return_format='base64')
+        if job: job.check_cancelled(); job.update(percent=10)
+        init_res = sys.generate_initial_mask(src, session_id, return_format='base64', model_name=model)
         if not init_res['success']:
             return init_res
+        if job and job.cancelled:
+            # Inference can't be interrupted mid-run; drop its output instead.
+            sys.cleanup_session(session_id)
+            job.check_cancelled()
+        if job: job.update(percent=80)
             
         final_res = sys.remove_background(
             session_id=session_id,
@@ -725,32 +1082,36 @@ def remove_bg(src, model='isnet-general-use', mode='remove_bg', blur_radius=15,
                 'success': True,
                 'path': final_res['result'],
                 'mode': mode,
-                'session_id': session_id
+                'session_id': session_id,
+                'load_seconds': init_res['load_seconds'],
+                'inference_seconds': init_res['inference_seconds']
             }
         else:
             return final_res
 
+    except JobCancelled:
+        raise
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def edit_mask(session_id, strokes):
+def edit_mask(session_id, strokes, display_size=None, tile=False):
     try:
         sys = _get_system()
-        return sys.edit_mask(session_id, strokes)
+        return sys.edit_mask(session_id, strokes, tuple(display_size) if display_size else None, tile=tile)
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def undo(session_id):
+def undo(session_id, tile=False):
     try:
         sys = _get_system()
-        return sys.undo(session_id)
+        return sys.undo(session_id, tile=tile)
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def redo(session_id):
+def redo(session_id, tile=False):
     try:
         sys = _get_system()
-        return sys.redo(session_id)
+        return sys.redo(session_id, tile=tile)
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
@@ -1,11 +1,272 @@
 import os
+import shutil
 import subprocess
+import tempfile
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from .base import _ff
+from .probe_cache import probe
+from . import jobs
+from .jobs import run_ffmpeg
 
-def convert(src, fmt, folder):
+_batches = {}
+_batches_lock = threading.Lock()
+MAX_FINISHED_BATCHES = 20
+
+_MP4_VIDEO = {'h264', 'hevc', 'av1', 'mpeg4', 'vp9'}
+_MP4_AUDIO = {'aac', 'mp3', 'ac3', 'eac3', 'opus', 'alac', 'flac'}
+_TEXT_SUBS = {'subrip', 'ass', 'ssa', 'webvtt', 'mov_text', 'text'}
+
+# Codecs each target container can hold as-is. None means "anything goes".
+# A kind missing from a container's entry means the container cannot carry it.
+REMUX_CODECS = {
+    'mp4': {'video': _MP4_VIDEO, 'audio': _MP4_AUDIO, 'subtitle': {'mov_text'}},
+    'm4v': {'video': _MP4_VIDEO, 'audio': _MP4_AUDIO, 'subtitle': {'mov_text'}},
+    'mov': {'video': _MP4_VIDEO | {'prores', 'mjpeg'}, 'audio': _MP4_AUDIO | {'pcm_s16le', 'pcm_s24le'}, 'subtitle': {'mov_text'}},
+    'mkv': {'video': None, 'audio': None, 'subtitle': None},
+    'webm': {'video': {'vp8', 'vp9', 'av1'}, 'audio': {'vorbis', 'opus'}, 'subtitle': {'webvtt'}},
+    'ts': {'video': {'h264', 'hevc', 'mpeg2video'}, 'audio': {'aac', 'mp3', 'mp2', 'ac3', 'eac3'}},
+    'm4a': {'audio': {'aac', 'alac'}},
+    'mp3': {'audio': {'mp3'}},
+    'aac': {'audio': {'aac'}},
+    'flac': {'audio': {'flac'}},
+    'opus': {'audio': {'opus'}},
+    'ogg': {'audio': {'vorbis', 'opus', 'flac'}},
+}
+
+# Opt-in segment-parallel encoding only pays off on long video sources.
+SEGMENT_FORMATS = {'mp4', 'm4v', 'mkv', 'mov', 'webm', 'avi', 'ts'}
+SEGMENT_MIN_DURATION = 120.0
+
+def _default_workers():
+    return max(1, os.cpu_count() or 1)
+
+def _remux_plan(info, fmt):
+    """Return extra output args for a stream-copy remux into ``fmt``, or None if
+    any stream ffmpeg would pick by default has to be re-encoded."""
+    allowed = REMUX_CODECS.get(fmt.lower())
+    if allowed is None: return None
+
+    streams = info.get('streams', [])
+    video = [s for s in streams if s.get('codec_type') == 'video' and not s.get('disposition', {}).get('attached_pic')]
+    audio = [s for s in streams if s.get('codec_type') == 'audio']
+    subs = [s for s in streams if s.get('codec_type') == 'subtitle']
+    if not video and not audio: return None
+
+    args = []
+    kept = 0
+    for kind, first in (('video', video[:1]), ('audio', audio[:1])):
+        if not first: continue
+        if kind not in allowed:
+            # e.g. mkv -> mp3: the video track would be dropped on re-encode too.
+            args.append('-vn' if kind == 'video' else '-an')
+            continue
+        codecs = allowed[kind]
+        if codecs is not None and first[0].get('codec_name') not in codecs: return None
+        kept += 1
+    if not kept: return None
+
+    args.extend(['-c', 'copy'])
+    sub_codecs = allowed.get('subtitle', set())
+    if subs and sub_codecs is not None and any(s.get('codec_name') not in sub_codecs for s in subs):
+        # Text subtitles are cheap to convert; anything else is dropped like a re-encode would.
+        if 'mov_text' in sub_codecs and all(s.get('codec_name') in _TEXT_SUBS for s in subs):
+            args.extend(['-c:s', 'mov_text'])
+        else:
+            args.append('-sn')
+    return args
+
+def _segmentable(info):
+    """Only plain one-video/at-most-one-audio sources are split; anything with
+    subtitles, extra tracks or data streams takes the normal path, which keeps them."""
+    kinds = [s.get('codec_type') for s in info.get('streams', [])
+             if not s.get('disposition', {}).get('attached_pic')]
+    return kinds.count('video') == 1 and kinds.count('audio') <= 1 and len(kinds) == kinds.count('video') + kinds.count('audio')
+
+def _segment_encode(src, fmt, outfile, info, duration, segments, job=None):
+    """Split the video track at keyframes, encode the pieces in parallel and
+    join them with the concat demuxer. Audio is encoded once, alongside the
+    pieces, so there are no priming gaps at the joins."""
+    tmp = tempfile.mkdtemp(prefix='mss_seg_')
+    try:
+        split = [_ff(), '-y', '-i', src, '-map', '0:v:0', '-c', 'copy', '-f', 'segment',
+                 '-segment_time', f"{duration / segments:.3f}", '-reset_timestamps', '1',
+                 os.path.join(tmp, 'src%03d.mkv')]
+        run_ffmpeg(split)
+        if job: job.check_cancelled()
+        parts = sorted(f for f in os.listdir(tmp) if f.startswith('src'))
+
+        has_audio = any(s.get('codec_type') == 'audio' for s in info.get('streams', []))
+        tasks = []
+        for i, part in enumerate(parts):
+            tasks.append([_ff(), '-y', '-i', os.path.join(tmp, part), os.path.join(tmp, f"enc{i:03d}.{fmt}")])
+        if has_audio:
+            tasks.append([_ff(), '-y', '-i', src, '-vn', '-sn', '-dn', os.path.join(tmp, f"audio.{fmt}")])
+        threads = str(max(1, _default_workers() // len(tasks)))
+        for cmd in tasks: cmd[-1:-1] = ['-threads', threads]
+
+        # Per-piece jobs so ffmpeg progress and kills work for each process; the
+        # outer job sees the summed video progress.
+        subjobs = [jobs.Job('convert-part') for _ in tasks]
+        if job: job.duration = duration
+        with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='convert-seg') as pool:
+            futures = [pool.submit(run_ffmpeg, cmd, sj) for cmd, sj in zip(tasks, subjobs)]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                if job:
+                    if job.cancelled:
+                        for sj in subjobs: sj.cancel()
+                    job.update(out_time=sum(sj.out_time for sj in subjobs[:len(parts)]))
+            for f in futures: f.result()
+
+        if job: job.check_cancelled()
+        with open(os.path.join(tmp, 'list.txt'), 'w', encoding='utf-8') as f:
+            for i in range(len(parts)):
+                f.write(f"file 'enc{i:03d}.{fmt}'\n")
+        # Inputs first (ffmpeg applies options to the next file): video pieces,
+        # encoded audio, then the source for chapters and tags, as the normal path keeps them.
+        cmd = [_ff(), '-y', '-f', 'concat', '-safe', '0', '-i', os.path.join(tmp, 'list.txt')]
+        if has_audio: cmd.extend(['-i', os.path.join(tmp, f"audio.{fmt}")])
+        meta = str(2 if has_audio else 1)
+        cmd.extend(['-i', src, '-map', '0:v'])
+        if has_audio: cmd.extend(['-map', '1:a'])
+        cmd.extend(['-map_metadata', meta, '-map_chapters', meta, '-c', 'copy', outfile])
+        run_ffmpeg(cmd)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def _convert_one(src, fmt, folder, threads=None, job=None, segments=None):
+    name = os.path.splitext(os.path.basename(src))[0]
+    outfile = os.path.join(folder, f"{name}.{fmt}")
+
+    info = {}
+    try:
+        info = probe(src)
+    except Exception:
+        pass
+    duration = info.get('summary', {}).get('duration')
+
+    plan = _remux_plan(info, fmt) if info else None
+    if plan is not None:
+        try:
+            run_ffmpeg([_ff(), '-y', '-i', src] + plan + [outfile], job, duration)
+            return outfile, 'copy'
+        except subprocess.CalledProcessError:
+            pass  # Container refused the streams after all; transcode below.
+
+    has_video = any(s.get('codec_type') == 'video' for s in info.get('streams', []))
+    if (segments and int(segments) > 1 and has_video and _segmentable(info) and fmt.lower() in SEGMENT_FORMATS
+            and duration and duration >= SEGMENT_MIN_DURATION):
+        try:
+            _segment_encode(src, fmt, outfile, info, duration, int(segments), job)
+            return outfile, 'segmented'
+        except subprocess.CalledProcessError:
+            pass  # Split or join refused this source; encode it in one process below.
+
+    cmd = [_ff(), '-y', '-i', src]
+    if threads: cmd.extend(['-threads', str(threads)])
+    cmd.append(outfile)
+    run_ffmpeg(cmd, job, duration)
+    return outfile, 'transcode'
+
+def convert(src, fmt, folder, segments=None, job=None):
     try:
-        name = os.path.splitext(os.path.basename(src))[0]
-        outfile = os.path.join(folder, f"{name}.{fmt}")
-        subprocess.run([_ff(), '-y', '-i', src, outfile], check=True, creationflags=0x08000000)
-        return {'success': True}
+        _, mode = _convert_one(src, fmt, folder, job=job, segments=segments)
+        return {'success': True, 'mode': mode}
     except Exception as e: return {'success': False, 'error': str(e)}
+
+def _run_batch_item(src, fmt, folder, threads, segments=None, job=None):
+    out, mode = _convert_one(src, fmt, folder, threads, job, segments)
+    return {'success': True, 'path': out, 'mode': mode}
+
+def _prune_batches():
+    # Called with _batches_lock held; keeps the newest finished batches like JobManager._prune.
+    finished = []
+    for batch_id, batch in _batches.items():
+        ends = [i['job'].finished_at for i in batch['items']]
+        if all(ends): finished.append((max(ends), batch_id))
+    if len(finished) <= MAX_FINISHED_BATCHES: return
+    finished.sort()
+    for _, batch_id in finished[:len(finished) - MAX_FINISHED_BATCHES]:
+        del _batches[batch_id]
+
+def convert_batch(files, fmt, folder, max_workers=None, segments=None):
+    try:
+        if not files: return {'success': False, 'error': 'No files to convert'}
+        cores = _default_workers()
+        limit = jobs.manager.limits.get('convert', cores)
+        workers = max(1, min(int(max_workers or cores), limit, len(files)))
+        # Split the cores between the parallel FFmpeg processes instead of letting each spawn a thread per core.
+        threads = max(1, cores // workers)
+
+        batch_id = uuid.uuid4().hex[:12]
+        items = [{'src': f, 'job': jobs.create_job('convert', os.path.basename(f))} for f in files]
+        queue = deque(items)
+        batch = {'fmt': fmt, 'folder': folder, 'workers': workers, 'items': items}
+        with _batches_lock:
+            _prune_batches()
+            _batches[batch_id] = batch
+
+        # Only `workers` items sit in the shared convert pool at a time, so a big
+        # batch cannot crowd out single conversions started from elsewhere.
+        def _feed(_job=None):
+            with _batches_lock:
+                if not queue: return
+                item = queue.popleft()
+            jobs.manager.submit('convert', _run_batch_item, item['src'], fmt, folder, threads, segments,
+                                job=item['job'], on_done=_feed)
+
+        for _ in range(workers): _feed()
+
+        return {'success': True, 'batch_id': batch_id, 'total': len(files), 'workers': workers}
+    except Exception as e: return {'success': False, 'error': str(e)}
+
+def batch_status(batch_id):
+    with _batches_lock:
+        batch = _batches.get(batch_id)
+        if batch is None: return {'success': False, 'error': 'Unknown batch'}
+        batch_items = list(batch['items'])
+
+    items = []
+    counts = {'pending': 0, 'running': 0, 'done': 0, 'error': 0, 'cancelled': 0}
+    for i in batch_items:
+        st = i['job'].to_dict()
+        result = st['result'] or {}
+        counts[st['state']] += 1
+        items.append({
+            'src': i['src'],
+            'job_id': st['job_id'],
+            'state': st['state'],
+            'percent': st['percent'],
+            'error': st['error'],
+            'out': result.get('path'),
+            'mode': result.get('mode'),
+        })
+    return {
+        'success': True,
+        'batch_id': batch_id,
+        'total': len(items),
+        'pending': counts['pending'],
+        'running': counts['running'],
+        'done': counts['done'],
+        'failed': counts['error'],
+        'cancelled': counts['cancelled'],
+        'copied': sum(1 for i in items if i['mode'] == 'copy'),
+        'finished': counts['pending'] == 0 and counts['running'] == 0,
+        'items': items,
+    }
+
+def cancel_batch(batch_id):
+    with _batches_lock:
+        batch = _batches.get(batch_id)
+        if batch is None: return {'success': False, 'error': 'Unknown batch'}
+        batch_items = list(batch['items'])
+    cancelled = sum(1 for i in batch_items if i['job'].cancel())
+    return {'success': True, 'cancelled': cancelled}
+
+def forget_batch(batch_id):
+    with _batches_lock:
+        return _batches.pop(batch_id, None) is not None
@@ -1,24 +1,284 @@
 import yt_dlp
 import json
 import os
+import copy
+import shutil
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .base import choose_folder, _open_folder
+from .jobs import JobCancelled
+
+# Extraction results are reused for a while so analyze -> download (or a
+# second analyze) does not hit the site again. Stream URLs in them expire, so
+# the TTL stays well under YouTube's ~6h signature lifetime.
+ANALYZE_CACHE_SIZE = 32
+ANALYZE_TTL = 15 * 60
+
+# Network tuning for segmented (HLS/DASH) and large progressive downloads.
+# 'tuned' is used unless the opts JSON picks another profile; single keys in
+# the opts JSON override the profile.
+DOWNLOAD_PROFILES = {
+    'default': {},
+    'tuned': {
+        'concurrent_fragment_downloads': 8,
+        'http_chunk_size': 10 * 1024 * 1024,
+        'buffersize': 1024 * 1024,
+        'retries': 10,
+        'fragment_retries': 10,
+    },
+}
+DEFAULT_PROFILE = 'tuned'
+_PROFILE_KEYS = ('concurrent_fragment_downloads', 'http_chunk_size', 'buffersize', 'retries', 'fragment_retries')
+
+PLAYLIST_WORKERS = 3
+MAX_PLAYLIST_WORKERS = 8
+ARCHIVE_NAME = '.media_studio_archive_{}.txt'
+
+_TRACKING_PARAMS = ('fbclid', 'gclid')
+# Share/tracking params that are only safe to drop on these hosts; elsewhere
+# the same names can select content.
+_HOST_TRACKING_PARAMS = {
+    'youtube.com': ('si', 'feature', 'pp'),
+    'youtu.be': ('si', 'feature'),
+    'instagram.com': ('igshid', 'igsh'),
+}
+
+def _tracking_params(host):
+    for domain, params in _HOST_TRACKING_PARAMS.items():
+        if host == domain or host.endswith('.' + domain):
+            return _TRACKING_PARAMS + params
+    return _TRACKING_PARAMS
+
+def normalize_url(url):
+    """Cache key for a URL: case-folded host without www./m., no fragment,
+    no utm_*/click-id parameters (plus known share parameters on a few
+    hosts), sorted query."""
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix): host = host[len(prefix):]
+    drop = _tracking_params(host)
+    query = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in drop and not k.startswith('utm_'))
+    return urllib.parse.urlunsplit((parts.scheme.lower() or 'https', host, parts.path.rstrip('/') or '/',
+                                    urllib.parse.urlencode(query), ''))
+
+class InfoCache:
+    def __init__(self, max_items=ANALYZE_CACHE_SIZE, ttl=ANALYZE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url, raw=False):
+        """The processed info, or with raw=True the unprocessed extractor result
+        (only kept for single videos)."""
+        key = normalize_url(url)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None: return None
+            if time.monotonic() - item[0] > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[2] if raw else item[1]
+
+    def put(self, url, info, raw=None):
+        key = normalize_url(url)
+        with self._lock:
+            self._items[key] = (time.monotonic(), info, raw)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def discard(self, url):
+        with self._lock:
+            self._items.pop(normalize_url(url), None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+info_cache = InfoCache()
+
+def extract_info(url):
+    """Sanitized (JSON-safe) extract_info result, cached by normalized URL.
+    Playlists are extracted flat: entries are only resolved when needed.
+    For single videos the unprocessed result is cached too, so a download can
+    run its own format selection on it."""
+    info = info_cache.get(url)
+    if info is None:
+        with yt_dlp.YoutubeDL({'quiet':True, 'extract_flat': 'in_playlist'}) as ydl:
+            raw = ydl.extract_info(url, download=False, process=False)
+            kept = None
+            if raw.get('_type', 'video') == 'video':
+                # The processed result carries this pass's format selection
+                # (requested_formats etc.), which would leak into a re-process.
+                try: kept = copy.deepcopy(raw)
+                except Exception: pass
+            info = ydl.sanitize_info(ydl.process_ie_result(raw, download=False))
+        info_cache.put(url, info, kept)
+    return info
+
+class _FormatCheck(yt_dlp.postprocessor.PostProcessor):
+    """Before download: the formats about to be fetched must be the ones
+    this download selected."""
+    def run(self, info):
+        selected = str(info.get('format_id') or '').split('+')
+        requested = [f.get('format_id') for f in info.get('requested_formats') or []]
+        if requested and requested != selected:
+            raise yt_dlp.utils.PostProcessingError(
+                f"Selected format {'+'.join(selected)} but {'+'.join(requested)} would be downloaded")
+        return [], info
+
+def archive_path(folder, opts_data):
+    """One archive per output kind: a video saved at 720p doesn't mark the
+    same entry as done for mp3 or 1080p."""
+    if opts_data['type'] == 'audio':
+        fmt = opts_data.get('audio_fmt', 'mp3')
+        key = f"audio_{fmt}" if fmt == 'wav' else f"audio_{fmt}_{opts_data.get('bitrate')}"
+    else:
+        key = f"video_{opts_data.get('res')}_{opts_data.get('fps')}"
+    key = ''.join(c if c.isalnum() or c in '-_' else '-' for c in key)
+    return os.path.join(folder, ARCHIVE_NAME.format(key))
+
+def _job_hook(job):
+    def hook(d):
+        if job.cancelled:
+            raise yt_dlp.utils.DownloadCancelled('Cancelled by user')
+        if d.get('status') == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                job.update(percent=d.get('downloaded_bytes', 0) / total * 100)
+    return hook
+
+def network_opts(opts_data):
+    """yt-dlp options for the requested download profile. An external
+    downloader (e.g. aria2c) is only used when it is actually installed."""
+    opts = dict(DOWNLOAD_PROFILES.get(opts_data.get('profile') or DEFAULT_PROFILE, {}))
+    for key in _PROFILE_KEYS:
+        if opts_data.get(key) not in (None, ''): opts[key] = int(opts_data[key])
+    ext = opts_data.get('external_downloader')
+    if ext and shutil.which(ext):
+        opts['external_downloader'] = {'default': ext}
+        if opts_data.get('external_downloader_args'):
+            opts['external_downloader_args'] = {'default': list(opts_data['external_downloader_args'])}
+    return opts
+
+def _formats_summary(info):
+    formats = info.get('formats') or []
+    video = [f for f in formats if f.get('vcodec') not in (None, 'none') or f.get('height')]
+    return {
+        'count': len(formats),
+        'heights': sorted({f['height'] for f in video if f.get('height')}, reverse=True),
+        'fps': sorted({int(round(f['fps'])) for f in video if f.get('fps')}, reverse=True),
+        'has_audio': any(f.get('acodec') not in (None, 'none') for f in formats),
+    }
+
+def _entry_summary(index, entry):
+    return {'index': index, 'id': entry.get('id'), 'title': entry.get('title'),
+            'url': entry.get('webpage_url') or entry.get('url'), 'duration': entry.get('duration')}
+
+def compact_info(info):
+    """The part of an info dict the downloader tab actually shows."""
+    out = {k: info.get(k) for k in ('id', 'title', 'uploader', 'channel', 'thumbnail', 'duration', 'webpage_url', 'url')}
+    out['_type'] = info.get('_type') or 'video'
+    if out['_type'] == 'playlist':
+        entries = [e for e in (info.get('entries') or []) if e]
+        out['entry_count'] = len(entries)
+        out['entries'] = [_entry_summary(i, e) for i, e in enumerate(entries)]
+        if not out['thumbnail'] and entries:
+            out['thumbnail'] = entries[0].get('thumbnail') or (entries[0].get('thumbnails') or [{}])[-1].get('url')
+    else:
+        out['formats'] = _formats_summary(info)
+    return out
 
 def analyze(url):
-    with yt_dlp.YoutubeDL({'quiet':True}) as ydl:
-        return json.dumps(ydl.extract_info(url, download=False), ensure_ascii=False)
+    return json.dumps(compact_info(extract_info(url)), ensure_ascii=False)
 
-def download(url, opts_json):
+def analyze_entry(url, index):
+    """Details for one playlist entry, served from the cached playlist extraction."""
+    try:
+        info = extract_info(url)
+        entries = [e for e in (info.get('entries') or []) if e]
+        entry = entries[int(index)]
+        if entry.get('_type') == 'url':
+            entry = extract_info(entry.get('webpage_url') or entry['url'])
+        return dict(compact_info(entry), success=True, index=int(index))
+    except Exception as e: return {'success': False, 'error': str(e)}
+
+def _download_playlist(url, ydl_opts, workers, job=None):
+    """Download the entries of a (flat) playlist with ``workers`` YoutubeDL
+    instances side by side. Entries already in the download archive are
+    skipped without being extracted."""
+    info = extract_info(url)
+    entries = [e for e in (info.get('entries') or []) if e]
+    items = [{'index': i, 'title': e.get('title') or e.get('url'), 'state': 'pending', 'percent': 0.0, 'error': None}
+             for i, e in enumerate(entries)]
+    if job: job.items = items
+
+    def report():
+        if job and items:
+            job.update(percent=sum(100.0 if it['state'] in ('done', 'skipped', 'error') else it['percent']
+                                   for it in items) / len(items))
+
+    def run(item, entry):
+        if job and job.cancelled:
+            item['state'] = 'cancelled'
+            return
+        item['state'] = 'running'
+
+        def hook(d):
+            if job and job.cancelled:
+                raise yt_dlp.utils.DownloadCancelled('Cancelled by user')
+            if d.get('status') == 'downloading':
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                if total:
+                    item['percent'] = d.get('downloaded_bytes', 0) / total * 100
+                    report()
+
+        opts = dict(ydl_opts, noplaylist=True, progress_hooks=[hook], postprocessor_hooks=[hook])
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                if ydl.in_download_archive(entry):
+                    item['state'] = 'skipped'
+                else:
+                    ydl.process_ie_result(copy.deepcopy(entry), download=True)
+                    item['state'] = 'done'
+        except yt_dlp.utils.DownloadCancelled:
+            item['state'] = 'cancelled'
+        except Exception as e:
+            item['state'] = 'error'
+            item['error'] = str(e)
+        report()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='playlist-dl') as pool:
+        for f in [pool.submit(run, item, entry) for item, entry in zip(items, entries)]:
+            f.result()
+
+    if job and job.cancelled: raise JobCancelled('Download cancelled')
+    counts = {state: sum(1 for it in items if it['state'] == state) for state in ('done', 'skipped', 'error')}
+    return items, counts
+
+def download(url, opts_json, job=None):
     try:
-        folder = choose_folder()
-        if not folder: return {'success': False}
         opts_data = json.loads(opts_json)
+        folder = opts_data.get('folder') or choose_folder()
+        if not folder: return {'success': False}
         dtype = opts_data['type']
         is_playlist = opts_data.get('is_playlist', False)
         
+        # No resume options needed: yt-dlp keeps .part files (and .ytdl fragment
+        # state for HLS/DASH) by default, so a cancelled download continues when
+        # started again into the same folder.
         ydl_opts = {
             'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
             'quiet': True,
             'no_warnings': True,
+            **network_opts(opts_data),
         }
         
         if dtype == 'video':
@@ -62,20 +322,47 @@ def download(url, opts_json):
         
         
         if is_playlist:
-            ydl_opts['noplaylist'] = False
-        else:
-            ydl_opts['noplaylist'] = True
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+            # Repeated syncs of a playlist/channel into the same folder skip
+            # entries already fetched in this format without extracting them.
+            ydl_opts['download_archive'] = archive_path(folder, opts_data)
+            workers = max(1, min(int(opts_data.get('workers') or PLAYLIST_WORKERS), MAX_PLAYLIST_WORKERS))
+            items, counts = _download_playlist(url, ydl_opts, workers, job)
+            _open_folder(folder)
+            failed = [it for it in items if it['state'] == 'error']
+            message = f"Playlist: {counts['done']} downloaded, {counts['skipped']} already in archive"
+            if failed: message += f", {len(failed)} failed"
+            return {'success': True, 'message': message, 'items': items, **counts}
+
+        ydl_opts['noplaylist'] = True
         
-        _open_folder(folder)
+        if job:
+            ydl_opts['progress_hooks'] = [_job_hook(job)]
+            ydl_opts['postprocessor_hooks'] = [_job_hook(job)]
         
+        # Reuse a recent analyze of the same URL instead of extracting again.
+        # Only single videos keep an unprocessed result (a watch?v=..&list=..
+        # URL analyzes as a playlist but is downloaded here as one video).
+        cached = info_cache.get(url, raw=True)
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                if cached is None:
+                    ydl.download([url])
+                else:
+                    ydl.add_post_processor(_FormatCheck(), when='before_dl')
+                    try:
+                        ydl.process_ie_result(copy.deepcopy(cached), download=True)
+                    except yt_dlp.utils.DownloadError:
+                        # Most likely expired stream URLs; extract fresh.
+                        info_cache.discard(url)
+                        ydl.download([url])
+        except yt_dlp.utils.DownloadCancelled:
+            if job and job.cancelled: raise JobCancelled('Download cancelled')
+            raise
         
-        if is_playlist:
-            return {'success': True, 'message': 'Playlist downloaded successfully!'}
-        else:
-            return {'success': True, 'message': 'Downloaded successfully!'}
+        _open_folder(folder)
+        return {'success': True, 'message': 'Downloaded successfully!'}
             
+    except JobCancelled:
+        raise
     except Exception as e: 
         return {'success': False, 'error': str(e)}
@@ -1,42 +1,212 @@
 import os
-import subprocess
 import json
-from .base import _ff, _open_folder
+import shutil
+import subprocess
+import tempfile
+from .base import _ff, _ffprobe, _open_folder
+from .probe_cache import probe, media_duration
+from .jobs import run_ffmpeg
+
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+# Alpha expressions for the non-rectangular crops, in the cropped frame's W/H.
+SHAPE_ALPHA = {
+    'circle': "if(lte((X-W/2)^2+(Y-H/2)^2, (min(W,H)/2)^2), 255, 0)",
+    'triangle': "if(gt(Y, -2*H/W * abs(X-W/2) + H), 255, 0)",
+}
+
+MASK_DIR = os.path.join(os.getcwd(), 'temp', 'masks')
+
+def shape_mask(shape, w, h):
+    # Evaluated once on a single gray frame instead of per pixel per frame.
+    os.makedirs(MASK_DIR, exist_ok=True)
+    path = os.path.join(MASK_DIR, f"{shape}_{w}x{h}.png")
+    if not os.path.exists(path):
+        cmd = [_ff(), '-y', '-f', 'lavfi', '-i', f"color=c=black:s={w}x{h}",
+               '-vf', f"format=gray,geq=lum='{SHAPE_ALPHA[shape]}'", '-frames:v', '1', path]
+        subprocess.run(cmd, check=True, creationflags=0x08000000)
+    return path
+
+def shape_filter(crop, scale=None):
+    """filter_complex for a shaped crop of input 0 using the mask PNG given as input 1."""
+    w, h, x, y = crop['w'], crop['h'], crop['x'], crop['y']
+    graph = f"[0:v]crop={w}:{h}:{x}:{y},format=yuva420p[v];[1:v]format=gray[m];[v][m]alphamerge"
+    if scale: graph += f",scale={scale[0]}:{scale[1]}"
+    return graph + "[out]"
+
+# Seconds of packets read either side of a cut point when looking for keyframes.
+KEYFRAME_WINDOW = 30
+# Codecs whose boundary GOP we can re-encode and splice back in front of copied packets.
+SMART_CUT_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+# ffprobe profile names -> encoder profiles. Sources with any other profile are
+# re-encoded in full, since the spliced head has to match the copied tail.
+SMART_CUT_PROFILES = {
+    'h264': {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high',
+             'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444'},
+    'hevc': {'Main': 'main', 'Main 10': 'main10'},
+}
+# MP4/MOV keep a single set of parameter sets in the sample entry unless the
+# track is tagged as carrying them in-band.
+INBAND_TAGS = {'h264': 'avc3', 'hevc': 'hev1'}
+MOV_EXTS = ('.mp4', '.m4v', '.mov')
+
+def _head_encoder_args(stream):
+    """Encoder args that give the re-encoded head the source's profile, level
+    and pixel format, or None when they can't be matched."""
+    codec = stream.get('codec_name')
+    profile = SMART_CUT_PROFILES.get(codec, {}).get(stream.get('profile'))
+    level = stream.get('level') or 0
+    if profile is None or level <= 0 or not stream.get('pix_fmt'):
+        return None
+    args = ['-c:v', SMART_CUT_ENCODERS[codec], '-profile:v', profile, '-pix_fmt', stream['pix_fmt']]
+    if codec == 'h264':
+        args.extend(['-level:v', f"{level / 10:.1f}"])
+    else:
+        args.extend(['-x265-params', f"level-idc={level / 30:g}"])
+    return args
+
+def _splice_ok(path, at):
+    """Decode a few seconds around the join and report whether it was clean."""
+    cmd = [_ff(), '-v', 'error', '-xerror', '-ss', f"{max(0.0, at - 1):.3f}", '-t', '3', '-i', path,
+           '-map', '0:v:0', '-f', 'null', '-']
+    res = subprocess.run(cmd, capture_output=True, creationflags=0x08000000)
+    return res.returncode == 0 and not res.stderr.strip()
+
+def keyframes_near(src, t, start_time=0.0, window=KEYFRAME_WINDOW):
+    """Keyframe times (relative to the file start) of the first video stream
+    around ``t``. Only packet flags are read, nothing is decoded."""
+    lo, hi = max(0.0, t - window) + start_time, t + window + start_time
+    cmd = [_ffprobe(), '-v', 'error', '-select_streams', 'v:0', '-read_intervals', f"{lo:.3f}%{hi:.3f}",
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', src]
+    out = subprocess.run(cmd, check=True, capture_output=True, creationflags=0x08000000).stdout
+    kf = set()
+    for line in out.decode('utf-8', 'replace').splitlines():
+        pts, _, flags = line.strip().partition(',')
+        if 'K' in flags and pts not in ('', 'N/A'):
+            kf.add(round(float(pts) - start_time, 6))
+    return sorted(kf)
+
+def trim_copy(src, start, end, out, info, job=None):
+    """Cut [start, end) with input-side seeking and stream copy. When start
+    is not on a keyframe only the GOP up to the next keyframe is re-encoded.
+    Returns 'copy' or 'smart', or None when the cut needs a full re-encode."""
+    summary = info['summary']
+    start_time = float(info.get('format', {}).get('start_time') or 0)
+    clip = end - start
+    seek = ['-ss', f"{start:.6f}"] if start > 0 else []
+
+    kfs = keyframes_near(src, start, start_time) if start > 0 else []
+    if start == 0 or any(abs(k - start) < 0.001 for k in kfs):
+        cmd = [_ff(), '-y'] + seek + ['-t', f"{clip:.6f}", '-i', src, '-map', '0', '-c', 'copy',
+                                      '-avoid_negative_ts', 'make_zero', out]
+        run_ffmpeg(cmd, job, clip)
+        return 'copy'
+
+    codec = summary.get('video_codec')
+    stream = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'
+                   and not s.get('disposition', {}).get('attached_pic')), {})
+    encoder_args = _head_encoder_args(stream) if codec in SMART_CUT_ENCODERS else None
+    nxt = next((k for k in kfs if k > start), None)
+    if encoder_args is None or nxt is None or nxt >= end:
+        return None
 
-def edit_media(json_args):
+    tmp = tempfile.mkdtemp(prefix='mss_trim_')
+    try:
+        head = [_ff(), '-y', '-ss', f"{start:.6f}", '-t', f"{nxt - start:.6f}", '-i', src,
+                '-map', '0:v:0', '-an', '-sn'] + encoder_args + ['-preset', 'veryfast', '-crf', '16',
+                os.path.join(tmp, 'head.ts')]
+        run_ffmpeg(head, job, clip)
+
+        # A hair past the keyframe so the copy seek cannot land on the GOP before it.
+        tail = [_ff(), '-y', '-ss', f"{nxt + 0.0005:.6f}", '-t', f"{end - nxt:.6f}", '-i', src,
+                '-map', '0:v:0', '-an', '-sn', '-c:v', 'copy', os.path.join(tmp, 'tail.ts')]
+        run_ffmpeg(tail, job, clip, nxt - start)
+
+        with open(os.path.join(tmp, 'list.txt'), 'w', encoding='utf-8') as f:
+            f.write("file 'head.ts'\nfile 'tail.ts'\n")
+        # Every non-video track comes straight from the source, as on the copy
+        # path. Head and tail carry different SPS/PPS; keep them in-band so the
+        # tail's own parameter sets are used after the join.
+        cmd = [_ff(), '-y', '-f', 'concat', '-safe', '0', '-i', os.path.join(tmp, 'list.txt'),
+               '-ss', f"{start:.6f}", '-t', f"{clip:.6f}", '-i', src,
+               '-map', '0:v', '-map', '1', '-map', '-1:v', '-c', 'copy', '-avoid_negative_ts', 'make_zero']
+        if out.lower().endswith(MOV_EXTS): cmd.extend(['-tag:v', INBAND_TAGS[codec]])
+        cmd.append(out)
+        if job: job.check_cancelled()
+        run_ffmpeg(cmd)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    if not _splice_ok(out, nxt - start):
+        os.remove(out)
+        return None
+    return 'smart'
+
+def edit_media(json_args, job=None):
     try:
         args = json.loads(json_args)
         src = args['src']
         out_folder = args['folder']
         name = os.path.splitext(os.path.basename(src))[0]
-        ext = os.path.splitext(src)[1] if args.get('crop') and args['crop']['shape']=='rect' else '.png' 
-        if ext=='.mp4' or ext=='.avi': ext = '.mp4' 
-        
-        out = os.path.join(out_folder, f"{name}_edited{ext}")
-        
-        cmd = [_ff(), '-y', '-i', src]
-        vf = []
-        
+        is_video = src.lower().endswith(VIDEO_EXTS)
         c = args.get('crop')
-        if c:
-            w,h,x,y = c['w'], c['h'], c['x'], c['y']
-            if c['shape'] == 'rect':
-                vf.append(f"crop={w}:{h}:{x}:{y}")
-            elif c['shape'] == 'circle':
-                vf.append(f"crop={w}:{h}:{x}:{y}")
-                vf.append(f"format=yuva420p,geq=lum='p(X,Y)':a='if(lte((X-W/2)^2+(Y-H/2)^2, (min(W,H)/2)^2), 255, 0)'")
-            elif c['shape'] == 'triangle':
-                 vf.append(f"crop={w}:{h}:{x}:{y}")
-                 vf.append(f"format=yuva420p,geq=lum='p(X,Y)':a='if(gt(Y, -2*H/W * abs(X-W/2) + H), 255, 0)'")
+        shaped = bool(c) and c['shape'] in SHAPE_ALPHA
+
+        if shaped:
+            # Video needs a container with an alpha channel; VP9 in WebM has one.
+            ext = '.webm' if is_video else '.png'
+        elif (c and c['shape'] == 'rect') or is_video:
+            ext = os.path.splitext(src)[1]
+        else:
+            ext = '.png'
+        if ext=='.mp4' or ext=='.avi': ext = '.mp4'
+
+        out = os.path.join(out_folder, f"{name}_edited{ext}")
 
         rw, rh = args.get('w'), args.get('h')
-        if rw and rh and int(rw)>0:
-            vf.append(f"scale={rw}:{rh}")
-            
-        if vf: cmd.extend(['-vf', ",".join(vf)])
-        
+        scale = (rw, rh) if rw and rh and int(rw)>0 else None
+
+        start = float(args.get('start') or 0) if is_video else 0.0
+        end = float(args['end']) if is_video and args.get('end') else None
+        seek = []
+        mode = 'encode'
+        if start > 0 or end:
+            info = probe(src)
+            summary = info['summary']
+            if end is None or (summary['duration'] and end > summary['duration']): end = summary['duration']
+            if not end or end <= start: return {'success': False, 'error': 'Trim end must be after start'}
+            # The UI pre-fills the resize boxes with the source size; that is not a resize.
+            if scale and (int(scale[0]), int(scale[1])) == (summary['width'], summary['height']): scale = None
+            if not c and not scale:
+                try:
+                    mode = trim_copy(src, start, end, out, info, job) or mode
+                except subprocess.CalledProcessError:
+                    # e.g. a codec the target container cannot hold as-is.
+                    mode = 'encode'
+                if mode != 'encode':
+                    _open_folder(out_folder)
+                    return {'success': True, 'path': out, 'mode': mode}
+            seek = (['-ss', f"{start:.6f}"] if start > 0 else []) + ['-t', f"{end - start:.6f}"]
+
+        cmd = [_ff(), '-y'] + seek + ['-i', src]
+
+        if shaped:
+            mask = shape_mask(c['shape'], int(c['w']), int(c['h']))
+            cmd.extend(['-i', mask, '-filter_complex', shape_filter(c, scale), '-map', '[out]'])
+            if is_video:
+                cmd.extend(['-map', '0:a?', '-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p', '-row-mt', '1', '-c:a', 'libopus'])
+        else:
+            vf = []
+            if c:
+                vf.append(f"crop={c['w']}:{c['h']}:{c['x']}:{c['y']}")
+            if scale:
+                vf.append(f"scale={scale[0]}:{scale[1]}")
+            if vf: cmd.extend(['-vf', ",".join(vf)])
+
         cmd.append(out)
-        subprocess.run(cmd, check=True, creationflags=0x08000000)
+        duration = None
+        if job and is_video:
+            duration = (end - start) if seek else media_duration(src)
+        run_ffmpeg(cmd, job, duration)
         _open_folder(out_folder)
-        return {'success': True}
+        return {'success': True, 'path': out, 'mode': mode}
     except Exception as e: return {'success': False, 'error': str(e)}
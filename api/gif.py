@@ -1,31 +1,147 @@
 import os
-import subprocess
 import json
+import hashlib
+import uuid
+import subprocess
+import time
 from .base import _ff, _open_folder
+from .probe_cache import cache as probe_cache, media_duration
+from .jobs import run_ffmpeg
+
+PALETTE_DIR = os.path.join(os.getcwd(), 'temp', 'gif_palettes')
+MAX_PALETTES = 200
+
+# Preview mode: small, short, low-fps, single pass, kept in memory.
+PREVIEW_WIDTH = 240
+PREVIEW_FPS = 8
+PREVIEW_MAX_SECONDS = 6
+PREVIEW_TIMEOUT = 8
+
+def _trim_args(args):
+    trim = []
+    if float(args['start']) > 0: trim.extend(['-ss', args['start']])
+    if args['end']: trim.extend(['-to', args['end']])
+    return trim
+
+def _base_filters(args):
+    flt = []
+    if args.get('crop') and ':' in args['crop']:
+        flt.append(f"crop={args['crop']}")
+    flt.append(f"fps={args['fps']},scale={args['width']}:-1:flags=lanczos")
+    if args.get('dedupe'):
+        # Drop sampled frames that barely differ from the previous one; the GIF
+        # muxer turns the gap into a longer frame delay.
+        flt.append("mpdecimate")
+    return ",".join(flt)
 
-def make_gif(json_args):
+def _fps_mode_args(args):
+    return ['-fps_mode', 'vfr'] if args.get('dedupe') else []
+
+def palette_key(src, args):
+    path, size, mtime_ns = probe_cache.identity(src)
+    key = {
+        'src': [path, size, mtime_ns],
+        'start': str(args['start']), 'end': str(args['end'] or ''),
+        'crop': args.get('crop') or '', 'fps': str(args['fps']), 'width': str(args['width']),
+        'dedupe': bool(args.get('dedupe')),
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:24]
+
+def _prune_palettes():
+    try:
+        files = [os.path.join(PALETTE_DIR, f) for f in os.listdir(PALETTE_DIR) if f.endswith('.png') and not f.endswith('.tmp.png')]
+    except OSError:
+        return
+    if len(files) <= MAX_PALETTES: return
+    files.sort(key=os.path.getmtime)
+    for f in files[:len(files) - MAX_PALETTES]:
+        try: os.remove(f)
+        except OSError: pass
+
+def ensure_palette(src, args, job=None, duration=None):
+    """Stage 1: palettegen over the trimmed/cropped/scaled clip, cached on disk.
+    Returns (palette_path, was_cached)."""
+    os.makedirs(PALETTE_DIR, exist_ok=True)
+    path = os.path.join(PALETTE_DIR, palette_key(src, args) + '.png')
+    if os.path.exists(path):
+        os.utime(path)
+        return path, True
+
+    tmp = path[:-4] + f".{uuid.uuid4().hex[:8]}.tmp.png"
+    palettegen = "palettegen=stats_mode=diff" if args.get('dedupe') else "palettegen"
+    if job is None:
+        cmd = [_ff(), '-y'] + _trim_args(args) + ['-i', src, '-vf', f"{_base_filters(args)},{palettegen}", tmp]
+    else:
+        # palettegen only emits its frame at EOF, so -progress would sit at 0 for
+        # the whole pass; a null output fed the same frames reports how far the
+        # input has been read instead.
+        cmd = [_ff(), '-y'] + _trim_args(args) + ['-i', src, '-filter_complex',
+               f"{_base_filters(args)},split[s][n];[s]{palettegen}[p]",
+               '-map', '[p]', tmp, '-map', '[n]', '-f', 'null', '-']
+    try:
+        run_ffmpeg(cmd, job, duration)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+    _prune_palettes()
+    return path, False
+
+def render_gif(src, args, palette, out_path, job=None, duration=None, time_offset=0.0):
+    """Stage 2: map the clip onto an existing palette."""
+    # diff_mode=rectangle only re-dithers the region that changed since the last frame.
+    paletteuse = "paletteuse=diff_mode=rectangle" if args.get('dedupe') else "paletteuse"
+    cmd = [_ff(), '-y'] + _trim_args(args) + ['-i', src, '-i', palette,
+           '-lavfi', f"{_base_filters(args)}[x];[x][1:v]{paletteuse}"] + _fps_mode_args(args) + [out_path]
+    run_ffmpeg(cmd, job, duration, time_offset)
+
+def make_gif(json_args, job=None):
     try:
         args = json.loads(json_args)
         src = args['src']
         out_path = os.path.join(args['folder'], os.path.splitext(os.path.basename(src))[0] + ".gif")
-        
-        cmd = [_ff(), '-y']
-        if float(args['start']) > 0: cmd.extend(['-ss', args['start']])
-        if args['end']: cmd.extend(['-to', args['end']])
-        
-        cmd.extend(['-i', src])
-        
-        flt = []
-        if args.get('crop') and ':' in args['crop']:
-            flt.append(f"crop={args['crop']}")
-            
-        flt.append(f"fps={args['fps']},scale={args['width']}:-1:flags=lanczos")
-        flt.append("split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse")
-        
-        cmd.extend(['-vf', ",".join(flt)])
-        cmd.append(out_path)
-        
-        subprocess.run(cmd, check=True, creationflags=0x08000000)
+
+        t0 = time.perf_counter()
+        clip = None
+        if job:
+            start = float(args['start'] or 0)
+            end = float(args['end']) if args['end'] else media_duration(src)
+            clip = (end - start) if end else None
+
+        palette, cached = ensure_palette(src, args, job, clip * 2 if clip else None)
+        if job and clip: job.duration = clip if cached else clip * 2
+        render_gif(src, args, palette, out_path, job, None, 0.0 if cached or not clip else clip)
+        seconds = round(time.perf_counter() - t0, 2)
         _open_folder(out_path)
-        return {'success': True, 'path': out_path}
+        return {'success': True, 'path': out_path, 'palette_cached': cached,
+                'size': os.path.getsize(out_path), 'seconds': seconds, 'dedupe': bool(args.get('dedupe'))}
+    except Exception as e: return {'success': False, 'error': str(e)}
+
+def preview_gif(json_args):
+    """Render a downscaled, low-fps GIF of (at most) the first few seconds of
+    the trim range straight to memory. Gives up after PREVIEW_TIMEOUT seconds."""
+    try:
+        args = json.loads(json_args)
+        src = args['src']
+        start = float(args.get('start') or 0)
+        clip = PREVIEW_MAX_SECONDS
+        if args.get('end'):
+            clip = min(clip, float(args['end']) - start)
+        if clip <= 0: return {'success': False, 'error': 'End must be after start'}
+
+        preview = dict(args,
+                       fps=min(float(args.get('fps') or PREVIEW_FPS), PREVIEW_FPS),
+                       width=min(int(args.get('width') or PREVIEW_WIDTH), PREVIEW_WIDTH))
+        graph = (f"{_base_filters(preview)},split[a][b];"
+                 "[a]palettegen=max_colors=64[p];[b][p]paletteuse=dither=bayer:bayer_scale=3")
+        cmd = [_ff(), '-v', 'error', '-ss', str(start), '-t', str(clip), '-i', src,
+               '-lavfi', graph, '-f', 'gif', 'pipe:1']
+
+        t0 = time.perf_counter()
+        try:
+            out = subprocess.run(cmd, check=True, capture_output=True, timeout=PREVIEW_TIMEOUT,
+                                 creationflags=0x08000000).stdout
+        except subprocess.TimeoutExpired:
+            return {'success': False, 'error': f'Preview took longer than {PREVIEW_TIMEOUT}s'}
+        return {'success': True, 'data': out, 'seconds': round(time.perf_counter() - t0, 2),
+                'clip': clip, 'fps': preview['fps'], 'width': preview['width']}
     except Exception as e: return {'success': False, 'error': str(e)}
@@ -0,0 +1,320 @@
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_FINISHED_JOBS = 200
+
+# Concurrent jobs allowed per kind; anything not listed gets DEFAULT_LIMIT.
+JOB_LIMITS = {
+    'download': 3,
+    'convert': max(1, os.cpu_count() or 1),
+    'edit': 2,
+    'gif': 2,
+    'bg': 1,
+    'wave': 2,
+    'proxy': 1,
+}
+DEFAULT_LIMIT = 2
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class FFmpegError(subprocess.CalledProcessError):
+    """CalledProcessError whose message ends with ffmpeg's last stderr lines,
+    so callers returning str(e) show the actual error."""
+    def __str__(self):
+        msg = f"ffmpeg exited with status {self.returncode}"
+        return f"{msg}: {self.stderr.strip()}" if self.stderr and self.stderr.strip() else msg
+
+
+class Job:
+    def __init__(self, kind: str, label: str = ''):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.state = 'pending'
+        self.duration: Optional[float] = None
+        self.out_time = 0.0
+        self.fps: Optional[float] = None
+        self.speed: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        # Per-item status for jobs that fan out (e.g. playlist entries).
+        self.items: Optional[List[Dict[str, Any]]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._percent: Optional[float] = None
+        self._procs: List[subprocess.Popen] = []
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    def attach_process(self, proc: subprocess.Popen):
+        with self._lock:
+            self._procs.append(proc)
+        if self.cancelled:
+            _kill(proc)
+
+    def detach_process(self, proc: subprocess.Popen):
+        with self._lock:
+            if proc in self._procs:
+                self._procs.remove(proc)
+
+    def cancel(self) -> bool:
+        with self._lock:
+            if self.state in ('done', 'error', 'cancelled'):
+                return False
+            self._cancel.set()
+            procs = list(self._procs)
+            queued = self.state == 'pending'
+        for proc in procs:
+            _kill(proc)
+        if queued:
+            # Still waiting for a pool slot; report it cancelled straight away.
+            self.finish()
+        return True
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._cancel.is_set():
+                return False
+            self.state = 'running'
+            self.started_at = time.time()
+            return True
+
+    def update(self, out_time=None, fps=None, speed=None, percent=None):
+        with self._lock:
+            if out_time is not None: self.out_time = out_time
+            if fps is not None: self.fps = fps
+            if speed is not None: self.speed = speed
+            if percent is not None: self._percent = percent
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result = result
+            if self._cancel.is_set():
+                self.state = 'cancelled'
+                self.error = 'Cancelled'
+            else:
+                self.state = 'error' if error else 'done'
+                self.error = error
+            self.finished_at = time.time()
+
+    @property
+    def percent(self) -> Optional[float]:
+        if self.state == 'done': return 100.0
+        if self._percent is not None: return max(0.0, min(100.0, self._percent))
+        if not self.duration: return None
+        return max(0.0, min(100.0, self.out_time / self.duration * 100))
+
+    def eta(self) -> Optional[float]:
+        pct = self.percent
+        if self.state != 'running' or not pct or not self.started_at: return None
+        elapsed = time.time() - self.started_at
+        return elapsed * (100 - pct) / pct
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            pct = self.percent
+            eta = self.eta()
+            return {
+                'success': True,
+                'job_id': self.id,
+                'kind': self.kind,
+                'label': self.label,
+                'state': self.state,
+                'finished': self.state in ('done', 'error', 'cancelled'),
+                'percent': round(pct, 1) if pct is not None else None,
+                'eta': round(eta, 1) if eta is not None else None,
+                'fps': self.fps,
+                'speed': self.speed,
+                'out_time': round(self.out_time, 2),
+                'duration': self.duration,
+                'result': self.result,
+                'error': self.error,
+                'items': [dict(i) for i in self.items] if self.items is not None else None,
+            }
+
+
+def _kill(proc: subprocess.Popen):
+    try:
+        if proc.poll() is None:
+            proc.kill()
+    except OSError:
+        pass
+
+
+class JobManager:
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = dict(JOB_LIMITS if limits is None else limits)
+        self._jobs: Dict[str, Job] = {}
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, kind: str) -> ThreadPoolExecutor:
+        if kind not in self._pools:
+            limit = max(1, int(self.limits.get(kind, DEFAULT_LIMIT)))
+            self._pools[kind] = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"job-{kind}")
+        return self._pools[kind]
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished_at]
+        if len(finished) <= MAX_FINISHED_JOBS: return
+        finished.sort(key=lambda j: j.finished_at)
+        for j in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            del self._jobs[j.id]
+
+    def create(self, kind: str, label: str = '') -> Job:
+        job = Job(kind, label)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, kind: str, fn: Callable, *args, label: str = '', job: Optional[Job] = None,
+               on_done: Optional[Callable[[Job], None]] = None) -> Job:
+        """Queue ``fn(*args, job=job)`` on the pool for ``kind``. ``fn`` follows
+        the api convention of returning {'success': ..., 'error': ...}."""
+        job = job or self.create(kind, label)
+
+        def _run():
+            if not job.start():
+                if not job.finished_at: job.finish()
+            else:
+                try:
+                    res = fn(*args, job=job)
+                    if isinstance(res, dict) and not res.get('success', True):
+                        job.finish(result=res, error=res.get('error') or 'Failed')
+                    else:
+                        job.finish(result=res)
+                except JobCancelled:
+                    job.finish()
+                except Exception as e:
+                    job.finish(error=str(e))
+            if on_done: on_done(job)
+
+        with self._lock:
+            self._pool(kind).submit(_run)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        return job.cancel() if job else False
+
+    def list(self, kind: Optional[str] = None, active_only: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if kind: jobs = [j for j in jobs if j.kind == kind]
+        if active_only: jobs = [j for j in jobs if not j.finished_at]
+        return [j.to_dict() for j in sorted(jobs, key=lambda j: j.created_at)]
+
+
+manager = JobManager()
+
+
+def create_job(kind: str, label: str = '') -> Job:
+    return manager.create(kind, label)
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    return manager.get(job_id)
+
+
+def job_status(job_id: str) -> Dict[str, Any]:
+    job = get_job(job_id)
+    if job is None: return {'success': False, 'error': 'Unknown job'}
+    return job.to_dict()
+
+
+def start_job(kind: str, fn: Callable, *args, label: str = '') -> Dict[str, Any]:
+    job = manager.submit(kind, fn, *args, label=label)
+    return {'success': True, 'job_id': job.id}
+
+
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    if get_job(job_id) is None: return {'success': False, 'error': 'Unknown job'}
+    return {'success': manager.cancel(job_id)}
+
+
+def list_jobs(kind: Optional[str] = None, active_only: bool = False) -> List[Dict[str, Any]]:
+    return manager.list(kind, active_only)
+
+
+def _parse_progress_value(key, value):
+    try:
+        if key in ('out_time_us', 'out_time_ms'):
+            # ffmpeg reports both in microseconds.
+            return int(value) / 1_000_000
+        if key == 'fps':
+            return float(value)
+        if key == 'speed':
+            return float(value.rstrip('x'))
+    except ValueError:
+        return None
+    return None
+
+
+def run_ffmpeg(cmd: List[str], job: Optional[Job] = None, duration: Optional[float] = None,
+               time_offset: float = 0.0):
+    """Drop-in for subprocess.run(cmd, check=True) that streams ``-progress``
+    output into ``job`` and lets cancelling the job kill ffmpeg. ``cmd[0]``
+    must be the ffmpeg binary. ``time_offset`` is added to the reported
+    position, for jobs made of several passes over the same media."""
+    if job is None:
+        res = subprocess.run(cmd, stderr=subprocess.PIPE, creationflags=0x08000000)
+        if res.returncode != 0:
+            tail = res.stderr.decode('utf-8', 'replace').rstrip().splitlines()[-20:]
+            raise FFmpegError(res.returncode, cmd, stderr='\n'.join(tail))
+        return res
+
+    job.check_cancelled()
+    if duration: job.duration = duration
+    full = [cmd[0], '-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    proc = subprocess.Popen(full, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            stdin=subprocess.DEVNULL, creationflags=0x08000000)
+    job.attach_process(proc)
+    stderr_tail = deque(maxlen=20)
+
+    def _read_stdout():
+        for raw in proc.stdout:
+            key, _, value = raw.decode('utf-8', 'replace').strip().partition('=')
+            parsed = _parse_progress_value(key, value)
+            if parsed is None: continue
+            if key in ('out_time_us', 'out_time_ms'): job.update(out_time=time_offset + parsed)
+            elif key == 'fps': job.update(fps=parsed)
+            elif key == 'speed': job.update(speed=parsed)
+
+    def _read_stderr():
+        for raw in proc.stderr:
+            stderr_tail.append(raw.decode('utf-8', 'replace').rstrip())
+
+    readers = [threading.Thread(target=_read_stdout, daemon=True), threading.Thread(target=_read_stderr, daemon=True)]
+    for t in readers: t.start()
+    try:
+        rc = proc.wait()
+        for t in readers: t.join()
+    finally:
+        job.detach_process(proc)
+    job.check_cancelled()
+    if rc != 0:
+        raise FFmpegError(rc, full, stderr='\n'.join(stderr_tail))
+    return subprocess.CompletedProcess(full, rc)
@@ -0,0 +1,124 @@
+import os
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from .base import _ffprobe
+
+CACHE_DB = 'media_cache.db'
+
+
+class ProbeCache:
+    """Metadata cache keyed by absolute path + size + mtime, so an edited or
+    replaced file is re-probed automatically. ``kind`` namespaces entries so
+    each feature can keep its own derived data for the same file."""
+
+    def __init__(self, db_path: str = CACHE_DB):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "path TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                "data TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (path, kind))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def identity(path: str):
+        st = os.stat(path)
+        return os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime_ns
+
+    def get(self, path: str, kind: str = 'ffprobe') -> Optional[Any]:
+        try:
+            key, size, mtime_ns = self.identity(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db().execute(
+                "SELECT size, mtime_ns, data FROM entries WHERE path = ? AND kind = ?", (key, kind)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        return json.loads(row[2])
+
+    def put(self, path: str, data: Any, kind: str = 'ffprobe') -> None:
+        key, size, mtime_ns = self.identity(path)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO entries (path, kind, size, mtime_ns, data, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, size, mtime_ns, json.dumps(data), time.time())
+            )
+            db.commit()
+
+    def cached(self, path: str, kind: str, fn: Callable[[], Any]) -> Any:
+        hit = self.get(path, kind)
+        if hit is not None:
+            return hit
+        data = fn()
+        if data is not None:
+            try:
+                self.put(path, data, kind)
+            except (OSError, sqlite3.Error):
+                pass
+        return data
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            db = self._db()
+            if path is None:
+                db.execute("DELETE FROM entries")
+            else:
+                db.execute("DELETE FROM entries WHERE path = ?", (os.path.normcase(os.path.abspath(path)),))
+            db.commit()
+
+
+cache = ProbeCache()
+
+
+def _run_ffprobe(src: str) -> Dict[str, Any]:
+    cmd = [_ffprobe(), '-v', 'error', '-show_format', '-show_streams', '-of', 'json', src]
+    out = subprocess.run(cmd, check=True, capture_output=True, creationflags=0x08000000).stdout
+    info = json.loads(out or b'{}')
+
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'
+                  and not s.get('disposition', {}).get('attached_pic')), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    try:
+        duration = float(info.get('format', {}).get('duration') or 0) or None
+    except ValueError:
+        duration = None
+
+    info['summary'] = {
+        'duration': duration,
+        'format_name': info.get('format', {}).get('format_name'),
+        'video_codec': video.get('codec_name') if video else None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'width': video.get('width') if video else None,
+        'height': video.get('height') if video else None,
+        'pix_fmt': video.get('pix_fmt') if video else None,
+        'sample_rate': int(audio['sample_rate']) if audio and audio.get('sample_rate') else None,
+        'channels': audio.get('channels') if audio else None,
+    }
+    return info
+
+
+def probe(src: str) -> Dict[str, Any]:
+    """ffprobe -show_format -show_streams output plus a 'summary' dict."""
+    return cache.cached(src, 'ffprobe', lambda: _run_ffprobe(src))
+
+
+def media_duration(src: str) -> Optional[float]:
+    try:
+        return probe(src)['summary']['duration']
+    except Exception:
+        return None
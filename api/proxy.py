@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import threading
+from .base import _ff
+from .probe_cache import cache as probe_cache, probe
+from . import jobs
+from .jobs import run_ffmpeg
+
+PROXY_DIR = os.path.join(os.getcwd(), 'temp', 'proxies')
+MAX_PROXY_BYTES = 2 * 1024 ** 3
+
+PROXY_MAX_HEIGHT = 540
+THUMB_WIDTH = 160
+SPRITE_COLS, SPRITE_ROWS = 10, 10
+
+# What the webview decodes smoothly; anything else (or anything big) gets a proxy.
+PLAYABLE_CODECS = ('h264', 'vp8', 'vp9', 'av1')
+PLAYABLE_PIX_FMTS = ('yuv420p', 'yuvj420p')
+
+_lock = threading.RLock()
+_active = {}
+
+def _key(src):
+    path, size, mtime_ns = probe_cache.identity(src)
+    return hashlib.sha1(f"{path}|{size}|{mtime_ns}".encode('utf-8')).hexdigest()[:24]
+
+def proxy_paths(src):
+    base = os.path.join(PROXY_DIR, _key(src))
+    return {'video': base + '.mp4', 'sprite': base + '_sprite.jpg', 'meta': base + '.json'}
+
+def needs_proxy(summary):
+    return ((summary.get('width') or 0) > 1920 or (summary.get('height') or 0) > 1080
+            or summary.get('video_codec') not in PLAYABLE_CODECS
+            or summary.get('pix_fmt') not in PLAYABLE_PIX_FMTS)
+
+def _prune():
+    # Evict whole proxies (video, sprite and meta of one key), oldest first. The
+    # meta file goes first so proxy_status never reports a half-deleted proxy ready.
+    groups = {}
+    try:
+        for f in os.listdir(PROXY_DIR):
+            if f.endswith('.tmp') or '.tmp.' in f: continue
+            path = os.path.join(PROXY_DIR, f)
+            g = groups.setdefault(f.split('.', 1)[0].split('_', 1)[0], {'files': [], 'size': 0, 'mtime': 0})
+            g['files'].append(path)
+            g['size'] += os.path.getsize(path)
+            g['mtime'] = max(g['mtime'], os.path.getmtime(path))
+    except OSError:
+        return
+    total = 0
+    for g in sorted(groups.values(), key=lambda g: g['mtime'], reverse=True):
+        total += g['size']
+        if total > MAX_PROXY_BYTES:
+            for f in sorted(g['files'], key=lambda f: not f.endswith('.json')):
+                try: os.remove(f)
+                except OSError: pass
+
+def generate(src, job=None):
+    """One decode pass writing a low-bitrate H.264 proxy and a thumbnail sprite sheet."""
+    try:
+        os.makedirs(PROXY_DIR, exist_ok=True)
+        paths = proxy_paths(src)
+        s = probe(src)['summary']
+        if not s['width']: return {'success': False, 'error': 'No video stream'}
+        duration = s['duration'] or 0
+        interval = max(duration / (SPRITE_COLS * SPRITE_ROWS), 1.0)
+        thumb_h = int(round(THUMB_WIDTH * s['height'] / s['width'] / 2)) * 2
+
+        tmp_video, tmp_sprite = paths['video'] + '.tmp.mp4', paths['sprite'] + '.tmp.jpg'
+        cmd = [_ff(), '-y', '-i', src,
+               '-map', '0:v:0', '-map', '0:a:0?', '-vf', f"scale=-2:'min({PROXY_MAX_HEIGHT},ih)'",
+               '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30', '-maxrate', '1500k', '-bufsize', '3000k',
+               '-pix_fmt', 'yuv420p', '-g', '48', '-c:a', 'aac', '-b:a', '96k', '-ac', '2',
+               '-movflags', '+faststart', tmp_video,
+               '-map', '0:v:0', '-vf', f"fps=1/{interval:.3f},scale={THUMB_WIDTH}:{thumb_h},tile={SPRITE_COLS}x{SPRITE_ROWS}",
+               '-frames:v', '1', '-q:v', '5', tmp_sprite]
+        try:
+            run_ffmpeg(cmd, job, duration or None)
+            os.replace(tmp_video, paths['video'])
+            os.replace(tmp_sprite, paths['sprite'])
+        finally:
+            for f in (tmp_video, tmp_sprite):
+                if os.path.exists(f): os.remove(f)
+
+        meta = {'width': s['width'], 'height': s['height'], 'duration': duration,
+                'sprite_cols': SPRITE_COLS, 'sprite_rows': SPRITE_ROWS, 'sprite_interval': interval,
+                'thumb_width': THUMB_WIDTH, 'thumb_height': thumb_h}
+        with open(paths['meta'] + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(paths['meta'] + '.tmp', paths['meta'])
+        _prune()
+        return {'success': True, **meta}
+    except Exception as e: return {'success': False, 'error': str(e)}
+
+def proxy_status(src):
+    try:
+        paths = proxy_paths(src)
+        if os.path.exists(paths['meta']) and os.path.exists(paths['video']):
+            with open(paths['meta'], encoding='utf-8') as f:
+                meta = json.load(f)
+            return {'success': True, 'ready': True, 'video': paths['video'], 'sprite': paths['sprite'], **meta}
+        with _lock:
+            job_id = _active.get(_key(src))
+        job = jobs.get_job(job_id) if job_id else None
+        if job and job.state in ('pending', 'running'):
+            return {'success': True, 'ready': False, 'job_id': job_id}
+        return {'success': True, 'ready': False}
+    except Exception as e: return {'success': False, 'error': str(e)}
+
+def request_proxy(src):
+    """Return the cached proxy, or start generating one in the background.
+    Sources the webview can already play comfortably come back with needed=False."""
+    try:
+        s = probe(src)['summary']
+        if not s['width'] or not needs_proxy(s):
+            return {'success': True, 'ready': False, 'needed': False}
+        with _lock:
+            # Check and start under one lock so two requests can't both start a job.
+            st = proxy_status(src)
+            if st.get('ready') or st.get('job_id'): return dict(st, needed=True)
+            started = jobs.start_job('proxy', generate, src, label=os.path.basename(src))
+            _active[_key(src)] = started['job_id']
+        return {'success': True, 'ready': False, 'needed': True, 'job_id': started['job_id'],
+                'width': s['width'], 'height': s['height']}
+    except Exception as e: return {'success': False, 'error': str(e)}
@@ -12,6 +12,8 @@ import matplotlib.pyplot as plt
 import soundfile as sf
 import pandas as pd
 from datetime import datetime
+from .jobs import JobCancelled
+from .probe_cache import cache as probe_cache
 
 HISTORY_FILE = 'wave_auth_history.json'
 
@@ -69,11 +71,17 @@ def get_history_csv():
 
 
 
+def _audio_info(file_path):
+    def _read():
+        info = sf.info(file_path)
+        return {'duration': info.duration, 'samplerate': info.samplerate, 'format': info.format}
+    return probe_cache.cached(file_path, 'soundfile_info', _read)
+
 def smart_loader(file_path):
     try:
-        info = sf.info(file_path)
-        duration = info.duration
-        sr = info.samplerate
+        info = _audio_info(file_path)
+        duration = info['duration']
+        sr = info['samplerate']
         
         segment_duration = 60 
         y_parts = []
@@ -96,7 +104,7 @@ def smart_loader(file_path):
         
         y_display, _ = librosa.load(file_path, sr=sr, duration=180.0)
         
-        return y_full, y_display, sr, info.format
+        return y_full, y_display, sr, info['format']
     except Exception:
         return None, None, None, None
 
@@ -205,7 +213,24 @@ def clear_temp_images():
     except:
         return False
 
-def analyze_audio(file_path):
+def _cached_analysis(file_path, start_time):
+    # Same file (path + size + mtime) analysed before and its spectrogram is
+    # still on disk: skip decoding and the STFT entirely.
+    entry = probe_cache.get(file_path, 'wave_auth_analysis')
+    if not entry or not os.path.exists(entry.get('temp_image', '')):
+        return None
+    try:
+        with open(entry['temp_image'], 'rb') as f:
+            img_base64 = base64.b64encode(f.read()).decode('utf-8')
+    except OSError:
+        return None
+    entry = dict(entry)
+    entry['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    entry['process_time'] = f"{time.time() - start_time:.2f}s"
+    save_history(entry)
+    return dict(entry, spectrogram=img_base64)
+
+def analyze_audio(file_path, job=None):
     if not os.path.exists(file_path):
         return {"success": False, "error": "File not found"}
     
@@ -215,8 +240,12 @@ def analyze_audio(file_path):
         
     start_time = time.time()
     try:
+        cached = _cached_analysis(file_path, start_time)
+        if cached is not None:
+            return cached
         
         y_analysis, y_display, sr, fmt = smart_loader(file_path)
+        if job: job.check_cancelled(); job.update(percent=40)
         
         if y_analysis is None or len(y_analysis) == 0:
             return {"success": False, "error": "Could not process audio (Empty or Corrupt)"}
@@ -227,6 +256,7 @@ def analyze_audio(file_path):
         
         score, reasons, verdict = calculate_enterprise_score(metrics)
         mp3_guess = get_bandwidth_display(metrics)
+        if job: job.check_cancelled(); job.update(percent=60)
         
         
         plt.figure(figsize=(10, 4))
@@ -281,9 +311,16 @@ def analyze_audio(file_path):
             "temp_image": temp_path
         }
         
-        save_history({k:v for k,v in result.items() if k != 'spectrogram'})
+        entry = {k:v for k,v in result.items() if k != 'spectrogram'}
+        save_history(entry)
+        if temp_path:
+            try: probe_cache.put(file_path, entry, 'wave_auth_analysis')
+            except Exception: pass
         return result
         
+    except JobCancelled:
+        plt.close('all')
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
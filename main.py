@@ -8,11 +8,11 @@ USE_LAZY_IMPORTS = os.getenv('LAZY_IMPORTS', 'true').lower() == 'true'
 
 if USE_LAZY_IMPORTS:
     from lazy_import import lazy_import
-    from api import base
+    from api import base, jobs
 else:
-    from api import base, downloader, converter, editor, gif, shortener, bg_remover, wave_auth
+    from api import base, jobs, downloader, converter, editor, proxy, gif, shortener, bg_remover, wave_auth
 
-from server import run_server
+from server import run_server, get_stream_stats, publish_blob
 import ui
 
 class Api:
@@ -37,6 +37,12 @@ class Api:
         else:
             return editor
     
+    def _get_proxy(self):
+        if USE_LAZY_IMPORTS:
+            return lazy_import('proxy', lambda: __import__('api.proxy', fromlist=['proxy']), 'Preview Proxies')
+        else:
+            return proxy
+    
     def _get_gif(self):
         if USE_LAZY_IMPORTS:
             return lazy_import('gif', lambda: __import__('api.gif', fromlist=['gif']), 'GIF Maker')
@@ -79,21 +85,69 @@ class Api:
     def file_exists(self, path):
         return os.path.exists(path)
     
+    def stream_stats(self):
+        return get_stream_stats()
+    
     def analyze(self, url):
         return self._get_downloader().analyze(url)
     
+    def analyze_entry(self, url, index):
+        return self._get_downloader().analyze_entry(url, index)
+    
     def download(self, url, opts):
         return self._get_downloader().download(url, opts)
     
-    def convert(self, src, fmt, folder):
-        return self._get_converter().convert(src, fmt, folder)
+    def download_start(self, url, opts):
+        return jobs.start_job('download', self._get_downloader().download, url, opts, label=url)
+    
+    def convert(self, src, fmt, folder, segments=None):
+        return self._get_converter().convert(src, fmt, folder, segments)
+    
+    def convert_start(self, src, fmt, folder, segments=None):
+        return jobs.start_job('convert', self._get_converter().convert, src, fmt, folder, segments, label=os.path.basename(src))
+    
+    def convert_batch(self, files, fmt, folder, max_workers=None, segments=None):
+        return self._get_converter().convert_batch(files, fmt, folder, max_workers, segments)
+    
+    def convert_batch_status(self, batch_id):
+        return self._get_converter().batch_status(batch_id)
+    
+    def convert_batch_cancel(self, batch_id):
+        return self._get_converter().cancel_batch(batch_id)
     
     def edit_media(self, args):
         return self._get_editor().edit_media(args)
     
+    def request_proxy(self, src):
+        return self._get_proxy().request_proxy(src)
+    
+    def proxy_status(self, src):
+        return self._get_proxy().proxy_status(src)
+    
     def make_gif(self, args):
         return self._get_gif().make_gif(args)
     
+    def edit_media_start(self, args):
+        return jobs.start_job('edit', self._get_editor().edit_media, args)
+    
+    def gif_preview(self, args):
+        res = self._get_gif().preview_gif(args)
+        if res.get('success'):
+            res['url'] = publish_blob(res.pop('data'), 'image/gif')
+        return res
+
+    def make_gif_start(self, args):
+        return jobs.start_job('gif', self._get_gif().make_gif, args)
+    
+    def job_status(self, job_id):
+        return jobs.job_status(job_id)
+    
+    def cancel_job(self, job_id):
+        return jobs.cancel_job(job_id)
+    
+    def list_jobs(self, kind=None, active_only=False):
+        return jobs.list_jobs(kind, active_only)
+    
     def shorten_url(self, url, alias=None):
         return self._get_shortener().shorten_url(url, alias)
     
@@ -106,21 +160,30 @@ class Api:
     def remove_bg(self, src, model='isnet-general-use', mode='remove_bg', blur_radius=15, new_bg_path=None):
         return self._get_bg_remover().remove_bg(src, model, mode, blur_radius, new_bg_path)
     
-    def bg_edit(self, session_id, strokes, display_size):
-        return self._get_bg_remover().edit_mask(session_id, strokes, display_size)
+    def remove_bg_start(self, src, model='isnet-general-use', mode='remove_bg', blur_radius=15, new_bg_path=None):
+        return jobs.start_job('bg', self._get_bg_remover().remove_bg, src, model, mode, blur_radius, new_bg_path, label=os.path.basename(src))
+    
+    def bg_edit(self, session_id, strokes, display_size, tile=False):
+        return self._get_bg_remover().edit_mask(session_id, strokes, display_size, tile)
     
-    def bg_undo(self, session_id):
-        return self._get_bg_remover().undo(session_id)
+    def bg_undo(self, session_id, tile=False):
+        return self._get_bg_remover().undo(session_id, tile)
     
-    def bg_redo(self, session_id):
-        return self._get_bg_remover().redo(session_id)
+    def bg_redo(self, session_id, tile=False):
+        return self._get_bg_remover().redo(session_id, tile)
     
     def bg_save_export(self, session_id, folder):
         return self._get_bg_remover().save_result(session_id, folder)
     
+    def bg_model_stats(self):
+        return self._get_bg_remover().model_stats()
+    
     def wa_analyze(self, path):
         return self._get_wave_auth().analyze_audio(path)
     
+    def wa_analyze_start(self, path):
+        return jobs.start_job('wave', self._get_wave_auth().analyze_audio, path, label=os.path.basename(path))
+    
     def wa_history(self):
         return self._get_wave_auth().get_history()
     
@@ -138,10 +201,16 @@ def main():
         from api.bg_remover import cleanup_temp
         cleanup_temp()
     
+    api = Api()
+    # BG_WARMUP_MODEL=isnet-general-use (or any rembg model) preloads it while the UI starts.
+    warmup_model = os.getenv('BG_WARMUP_MODEL', '')
+    if warmup_model:
+        threading.Thread(target=lambda: api._get_bg_remover().warm_up(warmup_model), daemon=True).start()
+    
     t = threading.Thread(target=run_server, daemon=True)
     t.start()
     time.sleep(1)
-    webview.create_window("Media Studio Ultimate 2.4", "http://127.0.0.1:8000", width=1150, height=850, background_color='#0a0e17', js_api=Api())
+    webview.create_window("Media Studio Ultimate 2.4", "http://127.0.0.1:8000", width=1150, height=850, background_color='#0a0e17', js_api=api)
     webview.start(debug=False)
 
 if __name__ == '__main__':
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import gif
+from api.base import _ff
+
+
+def make_clip(path: str, seconds: int) -> None:
+    # Mostly static "screen recording": a still background with a small box that
+    # moves only during the first second of every five.
+    cmd = [
+        _ff(), '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration=1,loop=loop=-1:size=1,trim=duration={seconds}',
+        '-vf', "drawbox=x='if(lt(mod(t,5),1),mod(t,5)*600,600)':y=300:w=80:h=80:color=red:t=fill",
+        '-c:v', 'libx264', '-preset', 'ultrafast', path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def run(src: str, folder: str, dedupe: bool, fps: int, width: int) -> dict:
+    conf = {'src': src, 'folder': folder, 'start': '0', 'end': '', 'fps': str(fps),
+            'width': str(width), 'crop': '', 'dedupe': dedupe}
+    res = gif.make_gif(json.dumps(conf))
+    if not res['success']:
+        raise RuntimeError(res['error'])
+    os.remove(res['path'])
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GIF size/encode time with and without frame deduplication')
+    parser.add_argument('--seconds', type=int, default=20)
+    parser.add_argument('--fps', type=int, default=15)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--output', type=str, help='Save results to JSON file')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='mss_bench_')
+    try:
+        src = os.path.join(work, 'screen.mp4')
+        make_clip(src, args.seconds)
+
+        # Palettes are cached between runs, so each mode gets a fresh cache dir.
+        gif._open_folder = lambda path: None
+        gif.PALETTE_DIR = os.path.join(work, 'palettes_plain')
+        plain = run(src, work, False, args.fps, args.width)
+        gif.PALETTE_DIR = os.path.join(work, 'palettes_dedupe')
+        deduped = run(src, work, True, args.fps, args.width)
+
+        results = {
+            'clip_seconds': args.seconds, 'fps': args.fps, 'width': args.width,
+            'plain_bytes': plain['size'], 'plain_s': plain['seconds'],
+            'dedupe_bytes': deduped['size'], 'dedupe_s': deduped['seconds'],
+        }
+        results['size_ratio'] = results['dedupe_bytes'] / results['plain_bytes']
+
+        print(f"\n{'='*60}")
+        print(f"GIF DEDUPE BENCHMARK ({args.seconds}s, {args.width}px @ {args.fps}fps)")
+        print(f"{'='*60}")
+        print(f"Every frame:         {plain['size'] / 1024:.0f} KB in {plain['seconds']:.2f} s")
+        print(f"Deduped + rect diff: {deduped['size'] / 1024:.0f} KB in {deduped['seconds']:.2f} s")
+        print(f"Size ratio:          {results['size_ratio']:.2f}")
+        print(f"{'='*60}\n")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results saved to: {args.output}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
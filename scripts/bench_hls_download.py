@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import yt_dlp
+
+import server
+from api import downloader
+from api.base import _ff
+
+
+class SlowHandler(server.FullPathHandler):
+    """The built-in handler plus a fixed delay per request, so fragment
+    concurrency has some round-trip latency to hide on localhost."""
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_fixture(folder: str, seconds: int, bitrate: str) -> str:
+    cmd = [
+        _ff(), '-y', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', bitrate, '-g', '30',
+        '-f', 'hls', '-hls_time', '1', '-hls_list_size', '0',
+        '-hls_segment_filename', os.path.join(folder, 'seg%04d.ts'), os.path.join(folder, 'source.m3u8'),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return os.path.join(folder, 'source.m3u8')
+
+
+def rewrite_playlist(src: str, port: int) -> str:
+    # /stream only serves absolute paths, so point every segment at its own /stream URL.
+    folder = os.path.dirname(src)
+    lines = []
+    with open(src, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                path = os.path.join(folder, line)
+                line = f"http://127.0.0.1:{port}/stream?path={urllib.parse.quote(path)}"
+            lines.append(line)
+    out = os.path.join(folder, 'index.m3u8')
+    with open(out, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return out
+
+
+def run_download(url: str, profile: str, out_dir: str) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    opts = {'outtmpl': os.path.join(out_dir, 'out.%(ext)s'), 'quiet': True, 'no_warnings': True,
+            **downloader.network_opts({'profile': profile})}
+    start = time.perf_counter()
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        ydl.download([url])
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return {'seconds': elapsed, 'bytes': size, 'mb_per_sec': size / elapsed / 1024 / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HLS download throughput: default vs tuned download profile')
+    parser.add_argument('--seconds', type=int, default=60, help='Length of the HLS fixture (1s segments)')
+    parser.add_argument('--bitrate', default='4M')
+    parser.add_argument('--latency', type=float, default=50, help='Simulated per-request latency in ms')
+    parser.add_argument('--output', type=str, help='Save results to JSON file')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='mss_bench_')
+    SlowHandler.latency = args.latency / 1000
+    httpd = server.MediaServer(('127.0.0.1', 0), SlowHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        port = httpd.server_address[1]
+        fixture = rewrite_playlist(make_fixture(work, args.seconds, args.bitrate), port)
+        url = f"http://127.0.0.1:{port}/stream?path={urllib.parse.quote(fixture)}"
+
+        results = {'segments': args.seconds, 'latency_ms': args.latency}
+        for profile in ('default', 'tuned'):
+            print(f"  Downloading with '{profile}' profile...")
+            results[profile] = run_download(url, profile, os.path.join(work, profile))
+        results['speedup'] = results['default']['seconds'] / results['tuned']['seconds']
+
+        print(f"\n{'='*60}")
+        print(f"HLS DOWNLOAD BENCHMARK ({args.seconds} segments, {args.latency:.0f} ms latency)")
+        print(f"{'='*60}")
+        for profile in ('default', 'tuned'):
+            r = results[profile]
+            print(f"{profile + ':':<21}{r['seconds']:.2f} s ({r['mb_per_sec']:.1f} MB/s)")
+        print(f"Speedup:             {results['speedup']:.2f}x")
+        print(f"{'='*60}\n")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results saved to: {args.output}")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import converter
+from api.base import _ff
+
+
+def make_clip(path: str, seconds: int) -> None:
+    # mpeg2video is not MP4-remuxable, so converting to mp4 always re-encodes.
+    cmd = [
+        _ff(), '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'mpeg2video', '-q:v', '4', '-g', '60',
+        '-c:a', 'mp2', '-shortest', path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def time_convert(src: str, fmt: str, segments, out_dir: str) -> float:
+    # Separate folder so the output never overwrites the source (e.g. --format mkv).
+    out_dir = os.path.join(out_dir, 'out')
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    out, mode = converter._convert_one(src, fmt, out_dir, segments=segments)
+    elapsed = time.perf_counter() - start
+    expected = 'segmented' if segments else 'transcode'
+    if mode != expected:
+        raise RuntimeError(f"Expected {expected} path, got {mode}")
+    os.remove(out)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare single-process vs segment-parallel encoding')
+    parser.add_argument('--seconds', type=int, default=300, help='Length of the generated test clip')
+    parser.add_argument('--segments', type=int, default=os.cpu_count() or 4, help='Segments for the parallel run')
+    parser.add_argument('--format', default='mp4', help='Target format')
+    parser.add_argument('--iterations', type=int, default=1)
+    parser.add_argument('--output', type=str, help='Save results to JSON file')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='mss_bench_')
+    try:
+        src = os.path.join(work, 'clip.mkv')
+        print(f"Generating {args.seconds}s test clip...")
+        make_clip(src, args.seconds)
+
+        single, parallel = [], []
+        for i in range(args.iterations):
+            print(f"  Iteration {i+1}/{args.iterations}...", end='\r')
+            single.append(time_convert(src, args.format, None, work))
+            parallel.append(time_convert(src, args.format, args.segments, work))
+        print()
+
+        results = {
+            'clip_seconds': args.seconds,
+            'segments': args.segments,
+            'format': args.format,
+            'single_s_avg': sum(single) / len(single),
+            'segmented_s_avg': sum(parallel) / len(parallel),
+        }
+        results['speedup'] = results['single_s_avg'] / results['segmented_s_avg']
+
+        print(f"\n{'='*60}")
+        print("SEGMENT-PARALLEL ENCODE BENCHMARK")
+        print(f"{'='*60}")
+        print(f"Clip:                {args.seconds}s 720p30 -> {args.format}")
+        print(f"Single process:      {results['single_s_avg']:.1f} s")
+        print(f"{str(args.segments) + ' segments:':<21}{results['segmented_s_avg']:.1f} s")
+        print(f"Speedup:             {results['speedup']:.2f}x")
+        print(f"{'='*60}\n")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results saved to: {args.output}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
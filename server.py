@@ -1,43 +1,330 @@
 import http.server
-import socketserver
 import urllib.parse
+import mimetypes
+import hashlib
+import gzip
+import json
 import os
-import shutil
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from ui import HTML_CONTENT
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 PORT = 8000
+CHUNK_SIZE = 256 * 1024
+
+CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+}
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+USE_SENDFILE = hasattr(os, 'sendfile')
+
+
+class TransferStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, method, nbytes, seconds):
+        with self._lock:
+            s = self._stats.setdefault(method, {'requests': 0, 'bytes': 0, 'seconds': 0.0})
+            s['requests'] += 1
+            s['bytes'] += nbytes
+            s['seconds'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                method: dict(s, bytes_per_sec=(s['bytes'] / s['seconds']) if s['seconds'] > 0 else 0.0)
+                for method, s in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+stream_stats = TransferStats()
+
+
+class StaticPage:
+    def __init__(self, text, content_type='text/html; charset=utf-8'):
+        self.content_type = content_type
+        raw = text.encode('utf-8')
+        self.etag = '"' + hashlib.sha1(raw).hexdigest()[:20] + '"'
+        self.bodies = {'identity': raw, 'gzip': gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(raw, quality=11)
+
+    def pick_encoding(self, accept_encoding):
+        accepted = {}
+        for part in (accept_encoding or '').split(','):
+            token, _, params = part.strip().partition(';')
+            token = token.strip().lower()
+            if not token:
+                continue
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[token] = q
+        for enc in ('br', 'gzip'):
+            if enc in self.bodies and accepted.get(enc, accepted.get('*', 0)) > 0:
+                return enc
+        return 'identity'
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or any(t.removeprefix('W/') == self.etag for t in tags)
+
+
+INDEX_PAGE = StaticPage(HTML_CONTENT)
+
+
+class BlobStore:
+    """Small in-memory LRU of generated bytes (previews) served under /preview/."""
+
+    def __init__(self, max_items=16, max_bytes=64 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._bytes = 0
+
+    def put(self, data, content_type):
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._items[token] = (data, content_type)
+            self._bytes += len(data)
+            while self._items and (len(self._items) > self.max_items or self._bytes > self.max_bytes):
+                _, (old, _) = self._items.popitem(last=False)
+                self._bytes -= len(old)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            item = self._items.get(token)
+            if item is not None:
+                self._items.move_to_end(token)
+            return item
+
+
+blob_store = BlobStore()
+
+
+def publish_blob(data, content_type):
+    """Keep ``data`` in memory and return the local URL it is served from."""
+    return f"http://127.0.0.1:{PORT}/preview/{blob_store.put(data, content_type)}"
+
+
+def get_stream_stats():
+    return stream_stats.snapshot()
+
+
+def _content_type(fpath):
+    ext = os.path.splitext(fpath)[1].lower()
+    if ext in CONTENT_TYPES:
+        return CONTENT_TYPES[ext]
+    return mimetypes.guess_type(fpath)[0] or 'application/octet-stream'
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single byte range, None to serve the
+    whole file, or raise ValueError when the range cannot be satisfied."""
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m:
+        # Multi-range and malformed requests fall back to a full response.
+        return None
+    first, last = m.group(1), m.group(2)
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
 
 class FullPathHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
     def do_GET(self):
-        if self.path.startswith('/stream?path='):
-            query = urllib.parse.urlparse(self.path).query
-            params = urllib.parse.parse_qs(query)
-            if 'path' in params:
-                fpath = params['path'][0]
-                if os.path.exists(fpath):
-                    self.send_response(200)
-                    if fpath.lower().endswith('.mp4'): ctype = 'video/mp4'
-                    elif fpath.lower().endswith('.png'): ctype = 'image/png'
-                    elif fpath.lower().endswith('.jpg') or fpath.lower().endswith('.jpeg'): ctype = 'image/jpeg'
-                    elif fpath.lower().endswith('.gif'): ctype = 'image/gif'
-                    else: ctype = 'application/octet-stream'
-                    
-                    self.send_header('Content-type', ctype)
-                    self.end_headers()
-                    with open(fpath, 'rb') as f:
-                        shutil.copyfileobj(f, self.wfile)
+        self._handle(head_only=False)
+
+    def do_HEAD(self):
+        self._handle(head_only=True)
+
+    def _handle(self, head_only):
+        try:
+            if self.path.startswith('/stream?path='):
+                query = urllib.parse.urlparse(self.path).query
+                params = urllib.parse.parse_qs(query)
+                if 'path' in params:
+                    fpath = params['path'][0]
+                    if os.path.isfile(fpath):
+                        self._send_file(fpath, head_only)
+                        return
+
+            if self.path == '/stats':
+                body = json.dumps(get_stream_stats()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                if not head_only:
+                    self.wfile.write(body)
+                return
+
+            if self.path.startswith('/preview/'):
+                item = blob_store.get(self.path[len('/preview/'):].split('?')[0])
+                if item is not None:
+                    self._send_blob(*item, head_only)
                     return
-        
-        if self.path in ['/', '/index.html']:
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html; charset=utf-8')
+
+            if self.path in ['/', '/index.html']:
+                self._send_page(INDEX_PAGE, head_only)
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            # The webview drops connections all the time while scrubbing.
+            self.close_connection = True
+
+    def _send_page(self, page, head_only):
+        if page.matches(self.headers.get('If-None-Match')):
+            self.send_response(304)
+            self.send_header('ETag', page.etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Vary', 'Accept-Encoding')
             self.end_headers()
-            self.wfile.write(HTML_CONTENT.encode('utf-8'))
-        else:
-            self.send_error(404)
+            return
+
+        encoding = page.pick_encoding(self.headers.get('Accept-Encoding'))
+        body = page.bodies[encoding]
+        self.send_response(200)
+        self.send_header('Content-Type', page.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', page.etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _send_blob(self, data, content_type, head_only):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(data)
+
+    def _send_file(self, fpath, head_only):
+        with open(fpath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                rng = parse_range(self.headers.get('Range'), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            if rng is None:
+                start, end = 0, size - 1
+                self.send_response(200)
+            else:
+                start, end = rng
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+
+            length = end - start + 1 if size else 0
+            self.send_header('Content-Type', _content_type(fpath))
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Last-Modified', self.date_time_string(int(os.fstat(f.fileno()).st_mtime)))
+            self.end_headers()
+
+            if head_only or length == 0:
+                return
+            self._transfer(f, start, length)
+
+    def _transfer(self, f, offset, length):
+        method = 'sendfile' if USE_SENDFILE else 'copy'
+        self._sent = 0
+        t0 = time.perf_counter()
+        try:
+            if USE_SENDFILE:
+                self._sendfile(f, offset, length)
+                if self._sent == 0:
+                    method = 'copy'
+            if self._sent < length:
+                self._copy(f, offset + self._sent, length - self._sent)
+        finally:
+            stream_stats.record(method, self._sent, time.perf_counter() - t0)
+
+    def _sendfile(self, f, offset, length):
+        out_fd = self.connection.fileno()
+        in_fd = f.fileno()
+        while self._sent < length:
+            try:
+                n = os.sendfile(out_fd, in_fd, offset + self._sent, min(length - self._sent, 0x7ffff000))
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except OSError:
+                # Some sockets/filesystems refuse sendfile; the rest goes through userspace.
+                return
+            if n == 0:
+                return
+            self._sent += n
+
+    def _copy(self, f, offset, length):
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            self._sent += len(chunk)
+            remaining -= len(chunk)
+
+
+class MediaServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
 
 def run_server():
-    socketserver.TCPServer.allow_reuse_address = True
-    with socketserver.TCPServer(("127.0.0.1", PORT), FullPathHandler) as httpd:
+    with MediaServer(("127.0.0.1", PORT), FullPathHandler) as httpd:
         print(f"Serving at 127.0.0.1:{PORT}")
         httpd.serve_forever()
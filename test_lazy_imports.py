@@ -18,7 +18,8 @@ elapsed = (time.time() - start) * 1000
 print(f"✓ Main module imported in {elapsed:.1f}ms")
 
 # Check which API modules are loaded
-api_modules = [m for m in sys.modules.keys() if m.startswith('api.') and m != 'api.base']
+# api.jobs (job manager) is stdlib-only and needed by Api at startup.
+api_modules = [m for m in sys.modules.keys() if m.startswith('api.') and m not in ('api.base', 'api.jobs')]
 print(f"\nHeavy API modules loaded at startup: {len(api_modules)}")
 for mod in sorted(api_modules):
     print(f"  - {mod}")
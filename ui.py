@@ -210,10 +210,22 @@ HTML_CONTENT = """<!DOCTYPE html>
                             <div style="font-weight:bold; margin-bottom:5px; color:var(--primary);">📋 Playlist Detected</div>
                             <div id="pl-title" style="margin-bottom:3px;"></div>
                             <div id="pl-count" style="color:#888; font-size:0.9em;"></div>
+                            <div id="pl-entries" style="max-height:150px; overflow-y:auto; margin-top:8px; font-size:0.85em;"></div>
+                            <div class="row" style="align-items:center; margin-top:8px; font-size:0.85em; color:#aaa;">
+                                <span>Parallel downloads</span>
+                                <select id="pl-workers" class="select-style" style="width:auto">
+                                    <option value="1">1</option>
+                                    <option value="2">2</option>
+                                    <option value="3" selected>3</option>
+                                    <option value="4">4</option>
+                                    <option value="6">6</option>
+                                </select>
+                            </div>
                         </div>
                     </div>
                     
-                    <button class="btn" onclick="dl_start()">Download Now</button>
+                    <button class="btn" onclick="dl_start()" id="dl-btn-start">Download Now</button>
+                    <button class="btn btn-secondary" onclick="dl_cancel()" id="dl-btn-cancel" style="display:none;">Cancel</button>
                     <div id="dl-status" class="status-text"></div>
                     <div id="dl-track-progress" style="text-align:center; margin-top:10px; color:#888; display:none;"></div>
                 </div>
@@ -242,7 +254,11 @@ HTML_CONTENT = """<!DOCTYPE html>
                 <div style="text-align:center; color:#555; padding:20px;">No files added yet.</div>
              </div>
              
+             <label style="display:flex; align-items:center; gap:8px; margin-bottom:15px; color:#aaa; font-size:0.9em;">
+                 <input type="checkbox" id="conv-segments"> Split long videos (2 min+) into parallel segments
+             </label>
              <button class="btn" style="width:100%; font-size:1.2em; padding:15px;" onclick="conv_start()">Start Batch Conversion</button>
+             <button class="btn btn-secondary" style="width:100%; margin-top:10px; display:none;" onclick="conv_cancel()" id="conv-btn-cancel">Cancel Batch</button>
              <div id="conv-status" class="status-text"></div>
         </div>
     </div>
@@ -291,6 +307,18 @@ HTML_CONTENT = """<!DOCTYPE html>
                         </div>
                     </div>
 
+                    <div style="background:#222; padding:15px; border-radius:10px; margin-bottom:10px">
+                        <label class="label-title">Trim (Sec, video)</label>
+                        <div class="row">
+                            <input id="ed-start" class="input-style" placeholder="Start" style="width:48%" oninput="edit_thumb('start')">
+                            <input id="ed-end" class="input-style" placeholder="End" style="width:48%" oninput="edit_thumb('end')">
+                        </div>
+                        <div class="row">
+                            <div id="ed-thumb-start" style="display:none; border-radius:4px"></div>
+                            <div id="ed-thumb-end" style="display:none; border-radius:4px"></div>
+                        </div>
+                    </div>
+
                     <div style="background:#222; padding:15px; border-radius:10px; margin-bottom:10px">
                         <div class="row" style="justify-content:space-between">
                             <label class="label-title">Crop</label>
@@ -338,24 +366,30 @@ HTML_CONTENT = """<!DOCTYPE html>
                      <div style="margin:15px 0">
                          <label class="label-title">Trim (Sec)</label>
                          <div class="row">
-                             <input id="gif-start" class="input-style" placeholder="Start" value="0">
-                             <input id="gif-end" class="input-style" placeholder="End">
+                             <input id="gif-start" class="input-style" placeholder="Start" oninput="gifPreviewSoon()" value="0">
+                             <input id="gif-end" class="input-style" placeholder="End" oninput="gifPreviewSoon()">
                          </div>
                          <label class="label-title">Settings</label>
                          <div class="row">
-                             <div class="col"><input id="gif-fps" class="input-style" value="15" title="FPS"></div>
-                             <div class="col"><input id="gif-width" class="input-style" value="480" title="Width"></div>
+                             <div class="col"><input id="gif-fps" class="input-style" oninput="gifPreviewSoon()" value="15" title="FPS"></div>
+                             <div class="col"><input id="gif-width" class="input-style" oninput="gifPreviewSoon()" value="480" title="Width"></div>
                          </div>
                          <div style="background:#222; padding:10px; border-radius:8px; margin-top:10px">
                              <div class="row" style="justify-content:space-between">
                                  <label class="label-title">Crop</label>
                                  <button class="btn btn-sm btn-secondary" onclick="toggleGifCrop()">Toggle Visual</button>
                              </div>
-                             <input id="gif-crop" class="input-style" placeholder="x:y:w:h">
+                             <input id="gif-crop" class="input-style" oninput="gifPreviewSoon()" placeholder="x:y:w:h">
                          </div>
+                         <label style="display:block; font-size:12px; color:#aaa; margin-top:10px" title="Drop duplicate frames and only re-encode changed regions (best for screen recordings)"><input type="checkbox" id="gif-dedupe"> Skip duplicate frames</label>
+                     </div>
+                     <div class="row" style="align-items:center; margin-bottom:10px">
+                         <button class="btn btn-sm btn-secondary" onclick="gif_quick_preview()">Quick Preview</button>
+                         <label style="font-size:12px; color:#aaa"><input type="checkbox" id="gif-live"> Live</label>
                      </div>
                      <button class="btn" style="width:100%" onclick="gif_create()">Create GIF</button>
                      <div id="gif-status" class="status-text"></div>
+                     <img id="gif-quick" style="display:none; width:100%; margin-top:10px; border-radius:8px; image-rendering:pixelated">
                 </div>
              </div>
         </div>
@@ -523,6 +557,7 @@ HTML_CONTENT = """<!DOCTYPE html>
                         <span id="bg-ph" style="color:#fff; background:rgba(0,0,0,0.5); padding:10px; border-radius:5px;">Select an image to remove background</span>
                         <img id="bg-preview" class="media-preview" style="display:none">
                         <img id="bg-result" class="media-preview" style="display:none; position:absolute; top:0; left:0; pointer-events:none;">
+                         <canvas id="bg-tiles" width="1" height="1" style="position:absolute; top:0; left:0; display:none; pointer-events:none; z-index:50;"></canvas>
                          <canvas id="bg-canvas" width="800" height="600" style="position:absolute; top:0; left:0; width:100%; height:100%; display:none; cursor:crosshair; pointer-events:auto; touch-action:none; z-index:100;"></canvas>
                     </div>
                 </div>
@@ -787,6 +822,29 @@ HTML_CONTENT = """<!DOCTYPE html>
         }
     }
     
+    function fmtEta(sec) {
+        if(sec === null || sec === undefined) return '';
+        sec = Math.round(sec);
+        return sec >= 60 ? `${Math.floor(sec/60)}m ${sec%60}s left` : `${sec}s left`;
+    }
+    
+    async function pollJob(jobId, onTick) {
+        while(true) {
+            const st = await window.pywebview.api.job_status(jobId);
+            if(!st.success || st.finished) return st;
+            if(onTick) onTick(st);
+            await new Promise(r => setTimeout(r, 500));
+        }
+    }
+    
+    function jobProgressText(prefix, st) {
+        if(st.percent === null || st.percent === undefined) return prefix + "...";
+        let txt = `${prefix} ${st.percent.toFixed(0)}%`;
+        if(st.speed) txt += ` @ ${st.speed}x`;
+        const eta = fmtEta(st.eta);
+        return eta ? `${txt} (${eta})` : txt;
+    }
+    
     let dlData = null;
     async function dl_analyze() {
         const url = document.getElementById('url').value;
@@ -801,22 +859,55 @@ HTML_CONTENT = """<!DOCTYPE html>
             if(dlData._type === 'playlist' && dlData.entries) {
                 document.getElementById('dl-title').innerText = dlData.title || "Playlist";
                 document.getElementById('dl-author').innerText = dlData.uploader || dlData.channel || "";
-                document.getElementById('dl-thumb').src = dlData.thumbnail || (dlData.entries[0] && dlData.entries[0].thumbnail) || "";
+                document.getElementById('dl-thumb').src = dlData.thumbnail || "";
                 
                 // Show playlist info
                 document.getElementById('pl-title').innerText = dlData.title || "Playlist";
-                document.getElementById('pl-count').innerText = `${dlData.entries.length} tracks`;
+                document.getElementById('pl-count').innerText = `${dlData.entry_count} tracks`;
+                const list = document.getElementById('pl-entries');
+                list.innerHTML = "";
+                dlData.entries.forEach(e => {
+                    const row = document.createElement('div');
+                    row.style.cssText = "padding:3px 0; cursor:pointer; color:#ccc; white-space:nowrap; overflow:hidden; text-overflow:ellipsis;";
+                    row.innerText = `${e.index + 1}. ${e.title || e.url}`;
+                    row.onclick = () => dl_entry(e.index);
+                    list.appendChild(row);
+                });
                 document.getElementById('dl-playlist-info').style.display = 'block';
+                dl_apply_formats(null);
             } else {
                 document.getElementById('dl-title').innerText = dlData.title || "Video";
                 document.getElementById('dl-author').innerText = dlData.uploader || "";
                 document.getElementById('dl-thumb').src = dlData.thumbnail || "";
+                dl_apply_formats(dlData.formats);
             }
             
             document.getElementById('dl-card').style.display = 'block';
             document.getElementById('dl-status').innerText = "Ready";
         } catch(e) { document.getElementById('dl-status').innerText = "Error: "+e; }
     }
+    // Grey out resolutions / frame rates the source does not have.
+    function dl_apply_formats(fmts) {
+        const maxH = (fmts && fmts.heights.length) ? fmts.heights[0] : null;
+        const maxFps = (fmts && fmts.fps.length) ? fmts.fps[0] : null;
+        const limit = (id, max) => {
+            const sel = document.getElementById(id);
+            for(const o of sel.options) o.disabled = !!(max && o.value !== 'best' && parseInt(o.value) > max);
+            if(sel.selectedOptions[0] && sel.selectedOptions[0].disabled) sel.value = 'best';
+        };
+        limit('dl-res', maxH);
+        limit('dl-fps', maxFps && maxFps <= 30 ? 30 : null);
+    }
+
+    // Playlist entries come without details; fetch one when it is clicked.
+    async function dl_entry(index) {
+        const url = dlData.webpage_url || dlData.url;
+        const e = await window.pywebview.api.analyze_entry(url, index);
+        if(!e.success) { document.getElementById('dl-status').innerText = "Error: " + e.error; return; }
+        document.getElementById('dl-thumb').src = e.thumbnail || dlData.thumbnail || "";
+        document.getElementById('dl-status').innerText = `${index + 1}. ${e.title || ""}` + (e.uploader ? ` - ${e.uploader}` : "");
+    }
+
     function updateDlOptions() {
         const type = document.getElementById('dl-type').value;
         document.getElementById('dl-opt-video').style.display = (type === 'video') ? 'flex' : 'none';
@@ -840,21 +931,57 @@ HTML_CONTENT = """<!DOCTYPE html>
             fps: document.getElementById('dl-fps').value,
             bitrate: document.getElementById('dl-bitrate').value,
             audio_fmt: document.getElementById('dl-audio-fmt') ? document.getElementById('dl-audio-fmt').value : 'mp3',
-            is_playlist: dlData._type === 'playlist'
+            is_playlist: dlData._type === 'playlist',
+            workers: document.getElementById('pl-workers').value
         };
 
+        const folder = await window.pywebview.api.choose_folder();
+        if(!folder) return;
+        opts.folder = folder;
+        
         document.getElementById('dl-status').innerText = "Downloading...";
         document.getElementById('dl-track-progress').style.display = 'none';
         
-        const res = await window.pywebview.api.download(dlData.webpage_url || dlData.url, JSON.stringify(opts));
+        const start = await window.pywebview.api.download_start(dlData.webpage_url || dlData.url, JSON.stringify(opts));
+        if(!start.success) { document.getElementById('dl-status').innerText = "Error: " + start.error; return; }
+        dlJobId = start.job_id;
+        document.getElementById('dl-btn-cancel').style.display = 'inline-block';
         
-        if(res.success) {
-            document.getElementById('dl-status').innerText = res.message || "Done!";
-            document.getElementById('dl-track-progress').style.display = 'none';
+        const st = await pollJob(dlJobId, s => {
+            document.getElementById('dl-status').innerText = jobProgressText("Downloading", s);
+            if(s.items) dl_render_tracks(s.items);
+        });
+        dlJobId = null;
+        document.getElementById('dl-btn-cancel').style.display = 'none';
+        
+        if(st.state === 'cancelled') {
+            document.getElementById('dl-status').innerText = "Download cancelled. Download again into the same folder to resume.";
+        } else if(st.state === 'done') {
+            document.getElementById('dl-status').innerText = (st.result && st.result.message) || "Done!";
+            if(st.result && st.result.items) dl_render_tracks(st.result.items);
+            else document.getElementById('dl-track-progress').style.display = 'none';
         } else {
-            document.getElementById('dl-status').innerText = "Error: " + res.error;
+            document.getElementById('dl-status').innerText = "Error: " + st.error;
         }
     }
+    
+    function dl_render_tracks(items) {
+        const count = st => items.filter(i => i.state === st).length;
+        const el = document.getElementById('dl-track-progress');
+        let txt = `Tracks: ${count('done') + count('skipped')}/${items.length} done, ${count('running')} downloading`;
+        if(count('skipped')) txt += `, ${count('skipped')} already downloaded`;
+        if(count('error')) txt += `, ${count('error')} failed`;
+        el.innerText = txt;
+        el.style.display = 'block';
+        const rows = document.getElementById('pl-entries').children;
+        const colors = { running: '#ffb400', done: '#00e676', skipped: '#888', error: '#ff0055', cancelled: '#666' };
+        items.forEach(i => { if(rows[i.index]) rows[i.index].style.color = colors[i.state] || '#ccc'; });
+    }
+
+    let dlJobId = null;
+    async function dl_cancel() {
+        if(dlJobId) await window.pywebview.api.cancel_job(dlJobId);
+    }
 
     let convFiles = [];
     async function conv_add() {
@@ -862,18 +989,26 @@ HTML_CONTENT = """<!DOCTYPE html>
         if(f) { convFiles = [...convFiles, ...f]; conv_render(); }
     }
     function conv_clear() { convFiles = []; conv_render(); }
-    function conv_render() {
+    const CONV_LABELS = { pending: 'Pending', running: 'Converting', done: 'Done', error: 'Error', cancelled: 'Cancelled' };
+    const CONV_COLORS = { pending: '#888', running: '#ffb400', done: '#00e676', error: '#ff0055', cancelled: '#666' };
+    let convBatchId = null;
+    async function conv_cancel() {
+        if(convBatchId) await window.pywebview.api.convert_batch_cancel(convBatchId);
+    }
+    function conv_render(items) {
         const list = document.getElementById('conv-list');
         if(convFiles.length === 0) {
             list.innerHTML = `<div style="text-align:center; color:#555; padding:20px;">No files added yet.</div>`;
             return;
         }
-        list.innerHTML = convFiles.map(x => 
-            `<div style="background:#222; padding:12px; margin-bottom:8px; border-radius:8px; display:flex; justify-content:space-between; align-items:center;">
+        list.innerHTML = convFiles.map((x, i) => {
+            const st = (items && items[i]) ? items[i].state : 'pending';
+            const pct = (items && items[i] && st === 'running' && items[i].percent !== null) ? ` ${Math.round(items[i].percent)}%` : '';
+            return `<div style="background:#222; padding:12px; margin-bottom:8px; border-radius:8px; display:flex; justify-content:space-between; align-items:center;">
                 <span style="font-size:0.9em; overflow:hidden; text-overflow:ellipsis;">${x.split(/[\\\\/]/).pop()}</span>
-                <span style="font-size:0.8em; color:#888; background:#333; padding:2px 6px; border-radius:4px;">Pending</span>
-             </div>`
-        ).join('');
+                <span style="font-size:0.8em; color:${CONV_COLORS[st]}; background:#333; padding:2px 6px; border-radius:4px;">${CONV_LABELS[st]}${pct}</span>
+             </div>`;
+        }).join('');
     }
     async function conv_start() {
         if(!convFiles.length) { alert("Add files first!"); return; }
@@ -884,25 +1019,38 @@ HTML_CONTENT = """<!DOCTYPE html>
         if(!folder) return;
         
         document.getElementById('conv-status').innerText = "Starting Batch Conversion...";
-        let errors = 0;
-        let done = 0;
         
         // Disable buttons
         const btns = document.querySelectorAll('#converter button');
         btns.forEach(b => b.disabled = true);
         
-        for(let i=0; i<convFiles.length; i++) {
-             const f = convFiles[i];
-             // Update status for this file
-             document.getElementById('conv-status').innerText = `Converting (${i+1}/${convFiles.length}): ${f.split(/[\\\\/]/).pop()}...`;
-             
-             const res = await window.pywebview.api.convert(f, fmt, folder);
-             if(!res.success) errors++;
-             else done++;
+        const segments = document.getElementById('conv-segments').checked ? Math.max(2, navigator.hardwareConcurrency || 4) : null;
+        const start = await window.pywebview.api.convert_batch(convFiles, fmt, folder, null, segments);
+        if(!start.success) {
+            btns.forEach(b => b.disabled = false);
+            document.getElementById('conv-status').innerText = "Error: " + start.error;
+            return;
+        }
+        
+        convBatchId = start.batch_id;
+        const cancelBtn = document.getElementById('conv-btn-cancel');
+        cancelBtn.disabled = false;
+        cancelBtn.style.display = 'block';
+        
+        let st = null;
+        while(true) {
+            st = await window.pywebview.api.convert_batch_status(start.batch_id);
+            if(!st.success) break;
+            conv_render(st.items);
+            document.getElementById('conv-status').innerText = `Converting ${st.done + st.failed}/${st.total} (${st.running} running on ${start.workers} workers)...`;
+            if(st.finished) break;
+            await new Promise(r => setTimeout(r, 500));
         }
         
+        convBatchId = null;
+        cancelBtn.style.display = 'none';
         btns.forEach(b => b.disabled = false);
-        document.getElementById('conv-status').innerText = `Batch Finished! Success: ${done}, Errors: ${errors}`;
+        document.getElementById('conv-status').innerText = st && st.success ? `Batch Finished! Success: ${st.done} (${st.copied} remuxed without re-encoding), Errors: ${st.failed}, Cancelled: ${st.cancelled}` : "Error: " + (st ? st.error : 'unknown');
         
         // Open folder
         await window.pywebview.api.open_directory(folder);
@@ -915,6 +1063,8 @@ HTML_CONTENT = """<!DOCTYPE html>
         const f = await window.pywebview.api.choose_files(false);
         if(f && f.length) {
             editFile = f[0];
+            editProxy = null; natW = 0; natH = 0;
+            edit_thumb('start'); edit_thumb('end');
             const url = "http://127.0.0.1:8000/stream?path=" + encodeURIComponent(editFile);
             
             const img = document.getElementById('edit-img');
@@ -922,9 +1072,13 @@ HTML_CONTENT = """<!DOCTYPE html>
             img.style.display='none'; vid.style.display='none';
             
             if(editFile.match(/\\.(mp4|avi|mov|mkv|webm)$/i)) {
-                vid.src = url;
                 vid.style.display = 'block';
+                // 4K / 10-bit / HEVC sources play from a cached low-bitrate proxy instead.
+                const px = await window.pywebview.api.request_proxy(editFile);
+                if(px.success && px.ready) { edit_show_proxy(vid, px); return; }
+                vid.src = url;
                 vid.onloadedmetadata = () => { natW=vid.videoWidth; natH=vid.videoHeight; initInputs(); };
+                if(px.success && px.job_id) edit_wait_proxy(editFile, px.job_id, vid);
             } else {
                 img.src = url;
                 img.style.display = 'block';
@@ -933,6 +1087,42 @@ HTML_CONTENT = """<!DOCTYPE html>
         }
     }
     
+    let editProxy = null;
+    function edit_show_proxy(vid, px) {
+        editProxy = px;
+        const t = vid.currentTime || 0;
+        // Crop math stays in source pixels; the proxy keeps the aspect ratio only.
+        vid.onloadedmetadata = () => {
+            const first = !natW;
+            natW = px.width; natH = px.height;
+            if(first) initInputs();
+            if(t) vid.currentTime = t;
+        };
+        vid.src = "http://127.0.0.1:8000/stream?path=" + encodeURIComponent(px.video);
+        edit_thumb('start'); edit_thumb('end');
+    }
+
+    async function edit_wait_proxy(file, jobId, vid) {
+        const status = document.getElementById('edit-status');
+        await pollJob(jobId, s => { if(editFile === file) status.innerText = jobProgressText("Preparing preview", s); });
+        if(editFile !== file) return;
+        status.innerText = "";
+        const px = await window.pywebview.api.proxy_status(file);
+        if(px.success && px.ready && editFile === file) edit_show_proxy(vid, px);
+    }
+
+    function edit_thumb(which) {
+        const el = document.getElementById('ed-thumb-' + which);
+        const t = parseFloat(document.getElementById('ed-' + which).value);
+        if(!editProxy || isNaN(t)) { el.style.display = 'none'; return; }
+        const px = editProxy;
+        const idx = Math.min(Math.floor(t / px.sprite_interval), px.sprite_cols * px.sprite_rows - 1);
+        el.style.width = px.thumb_width + 'px';
+        el.style.height = px.thumb_height + 'px';
+        el.style.background = `url("http://127.0.0.1:8000/stream?path=${encodeURIComponent(px.sprite)}") -${(idx % px.sprite_cols) * px.thumb_width}px -${Math.floor(idx / px.sprite_cols) * px.thumb_height}px`;
+        el.style.display = 'block';
+    }
+
     function initInputs() {
         document.getElementById('rs-w').value = natW;
         document.getElementById('rs-h').value = natH;
@@ -1071,6 +1261,8 @@ HTML_CONTENT = """<!DOCTYPE html>
             folder: folder,
             w: document.getElementById('rs-w').value,
             h: document.getElementById('rs-h').value,
+            start: document.getElementById('ed-start').value,
+            end: document.getElementById('ed-end').value,
             crop: isCrop ? {
                 x: document.getElementById('cp-x').value,
                 y: document.getElementById('cp-y').value,
@@ -1079,8 +1271,11 @@ HTML_CONTENT = """<!DOCTYPE html>
                 shape: document.getElementById('crop-shape').value
             } : null
         };
-        const res = await window.pywebview.api.edit_media(JSON.stringify(args));
-        document.getElementById('edit-status').innerText = res.success ? "Saved!" : "Error: "+res.error;
+        const start = await window.pywebview.api.edit_media_start(JSON.stringify(args));
+        if(!start.success) { document.getElementById('edit-status').innerText = "Error: "+start.error; return; }
+        const st = await pollJob(start.job_id, s => { document.getElementById('edit-status').innerText = jobProgressText("Processing", s); });
+        const fast = st.result && (st.result.mode === 'copy' || st.result.mode === 'smart');
+        document.getElementById('edit-status').innerText = (st.success && st.state === 'done') ? (fast ? "Saved! (stream copy)" : "Saved!") : "Error: "+st.error;
     }
 
     let gifV = null, natGw=0, natGh=0;
@@ -1164,6 +1359,7 @@ HTML_CONTENT = """<!DOCTYPE html>
         const finalH = Math.round(gBox.offsetHeight * (natGh / renderH));
         
         document.getElementById('gif-crop').value = `${finalX}:${finalY}:${finalW}:${finalH}`;
+        gifPreviewSoon();
     }
 
     async function gif_file() {
@@ -1179,6 +1375,39 @@ HTML_CONTENT = """<!DOCTYPE html>
             v.onloadedmetadata = () => { natGw=v.videoWidth; natGh=v.videoHeight; };
         }
     }
+    let gifPreviewTimer, gifPreviewBusy = false;
+    function gifPreviewSoon() {
+        if(!gifV || !document.getElementById('gif-live').checked) return;
+        clearTimeout(gifPreviewTimer);
+        gifPreviewTimer = setTimeout(gif_quick_preview, 700);
+    }
+
+    async function gif_quick_preview() {
+        if(!gifV) return;
+        if(gifPreviewBusy) { gifPreviewSoon(); return; }
+        gifPreviewBusy = true;
+        document.getElementById('gif-status').innerText = "Rendering preview...";
+        const conf = {
+            src: gifV,
+            start: document.getElementById('gif-start').value,
+            end: document.getElementById('gif-end').value,
+            fps: document.getElementById('gif-fps').value,
+            width: document.getElementById('gif-width').value,
+            crop: document.getElementById('gif-crop').value
+        };
+        try {
+            const res = await window.pywebview.api.gif_preview(JSON.stringify(conf));
+            if(res.success) {
+                const img = document.getElementById('gif-quick');
+                img.src = res.url;
+                img.style.display = 'block';
+                document.getElementById('gif-status').innerText = `Preview ${res.width}px @ ${res.fps}fps, ${res.clip.toFixed(1)}s (${res.seconds}s)`;
+            } else {
+                document.getElementById('gif-status').innerText = "Preview: " + res.error;
+            }
+        } finally { gifPreviewBusy = false; }
+    }
+
     async function gif_create() {
         if(!gifV) return;
         const folder = await window.pywebview.api.choose_folder();
@@ -1190,11 +1419,15 @@ HTML_CONTENT = """<!DOCTYPE html>
             end: document.getElementById('gif-end').value,
             fps: document.getElementById('gif-fps').value,
             width: document.getElementById('gif-width').value,
-            crop: document.getElementById('gif-crop').value 
+            crop: document.getElementById('gif-crop').value,
+            dedupe: document.getElementById('gif-dedupe').checked
         };
-        const res = await window.pywebview.api.make_gif(JSON.stringify(conf));
+        const start = await window.pywebview.api.make_gif_start(JSON.stringify(conf));
+        if(!start.success) { document.getElementById('gif-status').innerText = "Error: " + start.error; return; }
+        const st = await pollJob(start.job_id, s => { document.getElementById('gif-status').innerText = jobProgressText("Generating GIF", s); });
+        const res = (st.success && st.result) ? st.result : { success: false, error: st.error };
         if(res.success) {
-            document.getElementById('gif-status').innerText = "GIF Created!";
+            document.getElementById('gif-status').innerText = `GIF Created! ${(res.size/1048576).toFixed(2)} MB in ${res.seconds}s` + (res.dedupe ? " (deduped)" : "");
             document.getElementById('gif-vid').style.display='none';
             const img = document.getElementById('gif-preview');
             img.src = "http://127.0.0.1:8000/stream?path=" + encodeURIComponent(res.path) + "&t=" + new Date().getTime();
@@ -1350,6 +1583,7 @@ HTML_CONTENT = """<!DOCTYPE html>
     let bgTool = 'restore'; // 'restore' or 'erase'
     let bgIsDrawing = false;
     let bgStrokePoints = [];
+    let bgHasOverlay = false; // bg-result shows the mask overlay, so edits can come back as tiles
     
     async function bg_open() {
         const f = await window.pywebview.api.choose_files(false);
@@ -1364,6 +1598,7 @@ HTML_CONTENT = """<!DOCTYPE html>
             document.getElementById('btn-bg-save').disabled = true;
             document.getElementById('bg-tools').style.display = 'none';
             document.getElementById('bg-canvas').style.display = 'none';
+            document.getElementById('bg-tiles').style.display = 'none';
             document.getElementById('bg-status').innerText = "Ready to process.";
         }
     }
@@ -1378,7 +1613,9 @@ HTML_CONTENT = """<!DOCTYPE html>
         document.getElementById('btn-bg-process').disabled = true;
         
         // Pass mode='remove_bg' explicitly
-        const res = await window.pywebview.api.remove_bg(bgFile, model, 'remove_bg');
+        const start = await window.pywebview.api.remove_bg_start(bgFile, model, 'remove_bg');
+        const st = start.success ? await pollJob(start.job_id) : start;
+        const res = (st.success && st.result) ? st.result : { success: false, error: st.error };
         
         if(res.success) {
             bgResultPath = res.path;
@@ -1390,6 +1627,10 @@ HTML_CONTENT = """<!DOCTYPE html>
             document.getElementById('bg-result').style.display = 'block';
             
             // Enable Tools
+            bgHasOverlay = false;
+            const tiles = document.getElementById('bg-tiles');
+            tiles.getContext('2d').clearRect(0, 0, tiles.width, tiles.height);
+            tiles.style.display = 'none';
             document.getElementById('bg-tools').style.display = 'block';
             document.getElementById('bg-canvas').style.display = 'block';
             initBgCanvas();
@@ -1447,6 +1688,14 @@ HTML_CONTENT = """<!DOCTYPE html>
             c.style.width = displayW + 'px';
             c.style.height = displayH + 'px';
             
+            // Tile layer: natural resolution, scaled by CSS to the displayed image
+            const t = document.getElementById('bg-tiles');
+            t.style.left = left + 'px';
+            t.style.top = top + 'px';
+            t.style.width = displayW + 'px';
+            t.style.height = displayH + 'px';
+            if(t.width !== w || t.height !== h) { t.width = w; t.height = h; }
+            
             // Lưu thông tin để dùng sau
             c.dataset.displayWidth = displayW;
             c.dataset.displayHeight = displayH;
@@ -1611,23 +1860,16 @@ HTML_CONTENT = """<!DOCTYPE html>
         document.getElementById('bg-status').innerText = "Applying stroke...";
         
         try {
-            const res = await window.pywebview.api.bg_edit(bgSessionId, [stroke], displaySize);
+            const res = await window.pywebview.api.bg_edit(bgSessionId, [stroke], displaySize, bgHasOverlay);
             
             if(res.success) {
                 // Cập nhật preview
-                if(res.preview) {
-                    const img = document.getElementById('bg-result');
-                    if(res.preview.startsWith('data:')) {
-                        img.src = res.preview;
-                    } else {
-                        img.src = "data:image/png;base64," + res.preview;
-                    }
-                    
+                if(res.preview || res.tile !== undefined) {
                     // Chờ ảnh load xong rồi mới clear canvas
-                    img.onload = () => {
+                    bgApplyPreview(res, () => {
                         const ctx = c.getContext('2d');
                         ctx.clearRect(0, 0, c.width, c.height);
-                    };
+                    });
                 } else {
                     // Nếu không có preview, vẫn GIỮ canvas để user thấy được nét vẽ
                     console.warn('No preview returned from server');
@@ -1653,25 +1895,43 @@ HTML_CONTENT = """<!DOCTYPE html>
     
     async function bg_undo() {
         if(!bgSessionId) return;
-        const res = await window.pywebview.api.bg_undo(bgSessionId);
+        const res = await window.pywebview.api.bg_undo(bgSessionId, bgHasOverlay);
         handleEditRes(res, "Undo");
     }
     
     async function bg_redo() {
         if(!bgSessionId) return;
-        const res = await window.pywebview.api.bg_redo(bgSessionId);
+        const res = await window.pywebview.api.bg_redo(bgSessionId, bgHasOverlay);
         handleEditRes(res, "Redo");
     }
     
+    // Full previews replace the overlay image; tiles are painted over it at their rect.
+    function bgApplyPreview(res, done) {
+        const tiles = document.getElementById('bg-tiles');
+        if(res.preview) {
+            const img = document.getElementById('bg-result');
+            img.onload = () => {
+                tiles.getContext('2d').clearRect(0, 0, tiles.width, tiles.height);
+                if(done) done();
+            };
+            img.src = res.preview.startsWith('data:') ? res.preview : "data:image/png;base64," + res.preview;
+            bgHasOverlay = true;
+            tiles.style.display = 'block';
+        } else if(res.tile) {
+            const im = new Image();
+            im.onload = () => {
+                tiles.getContext('2d').drawImage(im, res.rect[0], res.rect[1]);
+                if(done) done();
+            };
+            im.src = res.tile;
+        } else if(done) {
+            done();
+        }
+    }
+    
     function handleEditRes(res, action) {
         if(res.success) {
-            if(res.preview) { // Check if we have a preview
-                 if(res.preview.startsWith('data:')) {
-                     document.getElementById('bg-result').src = res.preview;
-                 } else {
-                     document.getElementById('bg-result').src = "data:image/png;base64," + res.preview;
-                 }
-            }
+            bgApplyPreview(res);
             document.getElementById('bg-status').innerText = action + " successful.";
         } else {
             document.getElementById('bg-status').innerText = action + " failed: " + res.error;
@@ -1758,7 +2018,9 @@ HTML_CONTENT = """<!DOCTYPE html>
             status.innerText = `Analyzing ${i+1}/${waFiles.length}: ${f.split(/[\\\\/]/).pop()}...`;
             
             try {
-                const res = await window.pywebview.api.wa_analyze(f);
+                const start = await window.pywebview.api.wa_analyze_start(f);
+                const st = start.success ? await pollJob(start.job_id) : start;
+                const res = (st.success && st.result) ? st.result : { success: false, error: st.error };
                 if(res.success) {
                     statEl.style.color = "#00ff88";
                     statEl.innerText = "Done";